@@ -1,11 +1,11 @@
-from flask import Flask, render_template, request, flash, redirect, url_for, send_file, jsonify, Response
+from flask import Flask, render_template, request, flash, redirect, url_for, send_file, jsonify, Response, stream_with_context
 import os
 import fitz
 import secrets
 from datetime import datetime, timedelta
 import zipfile
 import io
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageOps
 import time
 import uuid
 import json
@@ -15,8 +15,19 @@ from reportlab.lib.utils import ImageReader
 import tempfile
 import cv2
 import numpy as np
-from rembg import remove
 import base64
+import hashlib
+import hmac
+import threading
+import queue
+import mimetypes
+from collections import OrderedDict, deque
+from itertools import chain
+import multiprocessing
+from multiprocessing.connection import Client
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 # Static folder support
 app = Flask(__name__, static_folder='static')
@@ -29,20 +40,86 @@ CROPPED_FOLDER = os.path.join(BASE_DIR, 'cropped')
 CONVERTED_FOLDER = os.path.join(BASE_DIR, 'converted')
 PASSPORT_FOLDER = os.path.join(BASE_DIR, 'passport_photos')
 RESUME_FOLDER = os.path.join(BASE_DIR, 'resumes')
+# Job status files, shared by all gunicorn workers so any of them can answer /jobs/<id>
+JOBS_FOLDER = os.path.join(BASE_DIR, 'jobs')
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(CROPPED_FOLDER, exist_ok=True)
 os.makedirs(CONVERTED_FOLDER, exist_ok=True)
 os.makedirs(PASSPORT_FOLDER, exist_ok=True)
 os.makedirs(RESUME_FOLDER, exist_ok=True)
+os.makedirs(JOBS_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['CROPPED_FOLDER'] = CROPPED_FOLDER
 app.config['CONVERTED_FOLDER'] = CONVERTED_FOLDER
 app.config['PASSPORT_FOLDER'] = PASSPORT_FOLDER
 app.config['RESUME_FOLDER'] = RESUME_FOLDER
+app.config['JOBS_FOLDER'] = JOBS_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+# Uploads above this many pixels are rejected before decoding (decompression bomb guard)
+app.config['IMAGE_MAX_PIXELS'] = int(os.environ.get('IMAGE_MAX_PIXELS', 64 * 1000 * 1000))
+
+# Card cropper: 'render' rasterizes the card regions, 'native' crops embedded card images when present
+app.config['CARD_EXTRACTION_MODE'] = os.environ.get('CARD_EXTRACTION_MODE', 'render')
+# Worker processes for multi-page card PDFs
+app.config['CARD_PAGE_WORKERS'] = int(os.environ.get('CARD_PAGE_WORKERS', os.cpu_count() or 2))
+# Largest PDF accepted for all_pages card extraction (every page is rendered at card DPI)
+app.config['CARD_MAX_PAGES'] = int(os.environ.get('CARD_MAX_PAGES', 20))
+# Threads running heavy route work (card crops, passport uploads, bulk conversion, resumes)
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', min(4, os.cpu_count() or 2)))
+# Lowest quality target_kb conversions use before shrinking the image instead
+app.config['TARGET_MIN_QUALITY'] = int(os.environ.get('TARGET_MIN_QUALITY', 40))
+# PDF uploads to the converter: default render DPI and most pages rasterized per PDF
+app.config['PDF_INPUT_DPI'] = int(os.environ.get('PDF_INPUT_DPI', 150))
+app.config['PDF_MAX_PAGES'] = int(os.environ.get('PDF_MAX_PAGES', 50))
+# Threads converting files inside bulk conversions (Pillow codecs release the GIL), shared by all requests
+app.config['CONVERT_WORKERS'] = int(os.environ.get('CONVERT_WORKERS', os.cpu_count() or 2))
+# Most files one bulk request converts at the same time, so one user can't take the whole pool
+app.config['CONVERT_PER_REQUEST'] = int(os.environ.get('CONVERT_PER_REQUEST', max(1, app.config['CONVERT_WORKERS'] // 2)))
+# Background removal model and onnxruntime threads per inference (keeps JOB_WORKERS x threads within the cores)
+app.config['REMBG_MODEL'] = os.environ.get('REMBG_MODEL', 'u2net')
+# Passport photo quality tiers: 'fast' uses the light model, 'best' the full one
+app.config['REMBG_MODEL_TIERS'] = {
+    'fast': os.environ.get('REMBG_FAST_MODEL', 'u2netp'),
+    'best': app.config['REMBG_MODEL']
+}
+app.config['PASSPORT_QUALITY'] = os.environ.get('PASSPORT_QUALITY', 'best')
+# Segmentation queue depth (queued passport jobs + segmentations in flight, inference servers included)
+# at which 'best' requests drop to the fast model - by default as soon as work waits for a job worker
+app.config['REMBG_DOWNGRADE_DEPTH'] = int(os.environ.get('REMBG_DOWNGRADE_DEPTH', app.config['JOB_WORKERS'] + 1))
+# Micro-batching for u2net-family inference: collection window (0 disables), batch size, wait cap in seconds
+app.config['REMBG_BATCH_WINDOW_MS'] = float(os.environ.get('REMBG_BATCH_WINDOW_MS', 10))
+app.config['REMBG_MAX_BATCH'] = int(os.environ.get('REMBG_MAX_BATCH', 8))
+app.config['REMBG_BATCH_TIMEOUT'] = float(os.environ.get('REMBG_BATCH_TIMEOUT', 30))
+# Segmentation runs on a copy at the model's input size; the mask is upsampled to the photo with a guided filter
+app.config['SEGMENTATION_SIDE'] = int(os.environ.get('SEGMENTATION_SIDE', 320))
+# Largest side kept for /process-image output (the old path cut everything to 600 px)
+app.config['PASSPORT_MAX_SIDE'] = int(os.environ.get('PASSPORT_MAX_SIDE', 2000))
+# Face detector for passport auto-crop (OpenCV's bundled frontal-face Haar cascade)
+app.config['FACE_CASCADE_PATH'] = os.environ.get(
+    'FACE_CASCADE_PATH',
+    os.path.join(getattr(getattr(cv2, 'data', None), 'haarcascades', ''), 'haarcascade_frontalface_default.xml')
+)
+# Optional hair/edge matting after segmentation (also per request with refine_edges=true); runs at <= MATTE_SIDE px
+app.config['PASSPORT_EDGE_REFINE'] = os.environ.get('PASSPORT_EDGE_REFINE', 'false').lower() == 'true'
+app.config['MATTE_SIDE'] = int(os.environ.get('MATTE_SIDE', 768))
+# Degraded mode: 'auto' switches to the GrabCut segmenter when the segmentation queue depth (same signal as
+# REMBG_DOWNGRADE_DEPTH) reaches REMBG_DEGRADE_DEPTH or recent p90 inference latency exceeds
+# REMBG_LATENCY_SLO_MS; 'off' / 'always' force it
+app.config['DEGRADED_MODE'] = os.environ.get('DEGRADED_MODE', 'auto')
+app.config['REMBG_DEGRADE_DEPTH'] = int(os.environ.get('REMBG_DEGRADE_DEPTH', app.config['JOB_WORKERS'] * 3))
+app.config['REMBG_LATENCY_SLO_MS'] = float(os.environ.get('REMBG_LATENCY_SLO_MS', 5000))
+# Out-of-process inference: comma-separated Unix socket paths of inference_server.py workers (empty runs in-process)
+app.config['INFERENCE_SOCKETS'] = [s for s in os.environ.get('INFERENCE_SOCKETS', '').split(',') if s.strip()]
+# Shared secret for the inference sockets - the channel unpickles what it receives, so there is no default
+app.config['INFERENCE_AUTHKEY'] = os.environ.get('INFERENCE_AUTHKEY', '').encode()
+if app.config['INFERENCE_SOCKETS'] and not app.config['INFERENCE_AUTHKEY']:
+    raise RuntimeError('INFERENCE_AUTHKEY must be set to a random secret when INFERENCE_SOCKETS is used')
+app.config['ORT_INTRA_OP_THREADS'] = int(os.environ.get('ORT_INTRA_OP_THREADS', max(1, (os.cpu_count() or 2) // app.config['JOB_WORKERS'])))
+app.config['ORT_INTER_OP_THREADS'] = int(os.environ.get('ORT_INTER_OP_THREADS', 1))
+
 # Store files info
 cropped_files_info = []
 converted_files_info = []
@@ -105,6 +182,390 @@ file_cleaner = FileCleaner(
     retention_minutes=5
 )
 
+# ==================== RESULT CACHES ====================
+
+class TTLCache:
+    """Thread-safe LRU cache bounded by entry count and per-entry TTL, with hit/miss counters"""
+    def __init__(self, name, max_entries=256, ttl_seconds=240):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        result_caches[name] = self
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def discard(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+# All caches register here so /metrics can report them
+result_caches = {}
+
+# Per-process secret so cache keys never contain a plain password hash
+CACHE_KEY_SECRET = secrets.token_bytes(16)
+
+def password_fingerprint(password):
+    """Keyed fingerprint of a PDF password for use in cache keys"""
+    return hmac.new(CACHE_KEY_SECRET, (password or '').encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+# Cropped card artifacts are auto-deleted after 5 minutes, so cached entries expire a bit earlier
+card_result_cache = TTLCache('card_crop', max_entries=512, ttl_seconds=240)
+
+# Background-removed passport cutouts (up to ~16 MB each at PASSPORT_MAX_SIDE) so recolor/resize skip segmentation
+mask_cache = TTLCache(
+    'passport_mask',
+    max_entries=int(os.environ.get('PASSPORT_MASK_CACHE_SIZE', 16)),
+    ttl_seconds=int(os.environ.get('PASSPORT_MASK_TTL', 1800))
+)
+
+# Converter outputs keyed by input content + options - repeated logos, signatures and re-clicks skip decode/encode.
+# Outputs over CONVERSION_CACHE_MAX_BYTES aren't kept, so memory stays under entries x that size
+conversion_cache = TTLCache(
+    'conversion',
+    max_entries=int(os.environ.get('CONVERSION_CACHE_SIZE', 64)),
+    ttl_seconds=int(os.environ.get('CONVERSION_CACHE_TTL', 600))
+)
+CONVERSION_CACHE_MAX_BYTES = int(os.environ.get('CONVERSION_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+
+# ==================== IMAGE DECODING ====================
+
+def open_image(source, target_size=None):
+    """Decode an uploaded image (path, bytes or file object) at the smallest scale covering target_size.
+    
+    JPEGs use draft() to decode straight at 1/2, 1/4 or 1/8 scale, other formats use reduce().
+    EXIF orientation is applied once, and images over IMAGE_MAX_PIXELS are refused before decoding.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    img = Image.open(source)
+    
+    if img.width * img.height > app.config['IMAGE_MAX_PIXELS']:
+        img.close()
+        raise ValueError(f'Image is too large ({img.width}x{img.height}), '
+                         f'maximum is {app.config["IMAGE_MAX_PIXELS"] // 1000000} megapixels')
+    
+    if target_size:
+        # Orientation isn't applied yet, so only the longest side is compared
+        side = max(target_size)
+        ratio = side / max(img.size)
+        if img.format == 'JPEG':
+            requested = (max(1, int(img.width * ratio + 0.999)), max(1, int(img.height * ratio + 0.999)))
+            img.draft(img.mode if img.mode in ('RGB', 'L') else None, requested)
+        else:
+            factor = int(1 / ratio) if ratio > 0 else 1
+            if factor >= 2 and not getattr(img, 'is_animated', False):
+                # reduce() rejects palette, 1-bit and 16-bit modes
+                if img.mode == 'P':
+                    img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+                elif img.mode == '1' or img.mode.startswith('I;16'):
+                    img = img.convert('L')
+                img = img.reduce(factor)
+    
+    orientation = img.getexif().get(0x0112, 1)
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    return img
+
+# ==================== BACKGROUND JOBS ====================
+
+class JobManager:
+    """Runs heavy work on a bounded thread pool and tracks job status for /jobs/<id> polling
+    
+    Every status change is also written to <status_folder>/<job_id>.json, so a poll that lands
+    on another gunicorn worker than the one running the job still finds it.
+    """
+    def __init__(self, max_workers=4, max_jobs=1000, retention_seconds=600, status_folder=None):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.retention_seconds = retention_seconds
+        self.status_folder = status_folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept_at = 0.0
+    
+    def submit(self, kind, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return the new job ID immediately"""
+        job_id = secrets.token_hex(8)
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        
+        def run():
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+            self._save(job)
+            try:
+                job['result'] = fn(*args, **kwargs)
+                job['status'] = 'done'
+            except Exception as e:
+                print(f"Job {job_id} ({kind}) failed: {str(e)}")
+                job['error'] = str(e)
+                job['status'] = 'failed'
+            finally:
+                job['finished_at'] = time.time()
+                self._save(job)
+        
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._save(job)
+        job['future'] = self._executor.submit(run)
+        return job_id
+    
+    def record(self, kind, result):
+        """Register work already finished in the request thread (cache hits) so async clients still get a job ID"""
+        job_id = secrets.token_hex(8)
+        now = time.time()
+        future = Future()
+        future.set_result(None)
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'status': 'done',
+            'created_at': now,
+            'started_at': now,
+            'finished_at': now,
+            'result': result,
+            'error': None,
+            'future': future
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._save(job)
+        return job_id
+    
+    def wait(self, job_id, timeout=None):
+        """Block until the job has finished and return its status"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job['future'].result(timeout=timeout)
+        return self.status(job_id)
+    
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            # Submitted by another worker process
+            job = self._load(job_id)
+        if job is None:
+            return None
+        
+        status = {key: value for key, value in job.items() if key != 'future'}
+        status['artifacts'] = job_artifacts(job['result']) if job['result'] else []
+        return status
+    
+    def pending(self, kinds=None):
+        """Jobs still waiting for a worker, optionally only of the given kinds"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values()
+                       if job['status'] == 'queued' and (kinds is None or job['kind'] in kinds))
+    
+    def stats(self):
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+        return {
+            'workers': self.max_workers,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'done': statuses.count('done'),
+            'failed': statuses.count('failed')
+        }
+    
+    def _status_path(self, job_id):
+        # Job IDs are hex tokens; anything else never maps to a file
+        if not self.status_folder or not job_id.isalnum():
+            return None
+        return os.path.join(self.status_folder, f'{job_id}.json')
+    
+    def _save(self, job):
+        path = self._status_path(job['job_id'])
+        if path is None:
+            return
+        data = {key: value for key, value in job.items() if key != 'future'}
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not save job {job['job_id']} status: {str(e)}")
+    
+    def _load(self, job_id):
+        path = self._status_path(job_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _prune(self):
+        # Forget finished jobs past retention, and the oldest ones beyond max_jobs
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            finished = job['finished_at'] is not None
+            if finished and (job['finished_at'] < cutoff or len(self._jobs) >= self.max_jobs):
+                del self._jobs[job_id]
+                path = self._status_path(job_id)
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        
+        # Status files left by other or restarted workers, swept at most once a minute
+        if not self.status_folder or time.time() - self._swept_at < 60:
+            return
+        self._swept_at = time.time()
+        for filename in os.listdir(self.status_folder):
+            path = os.path.join(self.status_folder, filename)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+def job_artifacts(result):
+    """Artifact filenames in a job result: any *_file or filename field, nested lists included"""
+    names = []
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if isinstance(value, str) and (key.endswith('_file') or key == 'filename'):
+                names.append(value)
+            elif isinstance(value, (dict, list)):
+                names.extend(job_artifacts(value))
+    elif isinstance(result, list):
+        for value in result:
+            names.extend(job_artifacts(value))
+    return list(dict.fromkeys(names))
+
+job_manager = JobManager(max_workers=app.config['JOB_WORKERS'], status_folder=app.config['JOBS_FOLDER'])
+
+# Shared by all bulk conversions; each request keeps at most CONVERT_PER_REQUEST files in flight
+convert_pool = ThreadPoolExecutor(max_workers=app.config['CONVERT_WORKERS'], thread_name_prefix='convert')
+
+def iter_bounded(fn, items, limit, executor=None):
+    """Yield fn(item) results (or the exception raised) in input order, at most limit in flight on the convert pool"""
+    executor = executor or convert_pool
+    pending = deque()
+    
+    def outcome(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+    
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max(1, limit):
+                yield outcome(pending.popleft())
+        while pending:
+            yield outcome(pending.popleft())
+    finally:
+        # Client went away mid-stream - drop work that hasn't started
+        for future in pending:
+            future.cancel()
+
+def map_bounded(fn, items, limit, executor=None):
+    """iter_bounded collected into a list"""
+    return list(iter_bounded(fn, items, limit, executor))
+
+def wants_async():
+    """Client asked for a job ID instead of waiting (?async=true, form field or JSON key)"""
+    if request.args.get('async') == 'true' or request.form.get('async') == 'true':
+        return True
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and data.get('async') is True
+
+def job_accepted(job_id, status='queued'):
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': status,
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+def finished_job_response(kind, result):
+    """Respond with a result computed in the request thread, in the same shape run_job would"""
+    if wants_async():
+        return job_accepted(job_manager.record(kind, result), status='done')
+    return jsonify(result)
+
+def run_job(kind, fn, *args, **kwargs):
+    """Run heavy route work as a job - async clients get 202 + job ID, others wait for the result"""
+    job_id = job_manager.submit(kind, fn, *args, **kwargs)
+    
+    if wants_async():
+        return job_accepted(job_id)
+    
+    job = job_manager.wait(job_id)
+    if job['status'] == 'failed':
+        return jsonify({'success': False, 'error': f"Processing failed: {job['error']}"})
+    return jsonify(job['result'])
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Poll a background job: queued / running / done / failed plus result artifacts"""
+    job = job_manager.status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(dict(job, success=True))
+
 # ==================== RESUME BUILDER ROUTES - COMPLETELY FIXED VERSION ====================
 
 @app.route('/free-resume-builder')
@@ -145,6 +606,18 @@ def save_resume():
             if photo_file and photo_file.filename != '':
                 photo_data = base64.b64encode(photo_file.read()).decode('utf-8')
 
+        # PDF generation runs as a job (?async=true returns a job ID to poll)
+        return run_job('resume', save_resume_job, resume_data, template, include_photo, photo_data)
+        
+    except Exception as e:
+        print(f"Resume creation error: {str(e)}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({'success': False, 'error': f'Resume creation failed: {str(e)}'})
+
+def save_resume_job(resume_data, template, include_photo, photo_data):
+    """Generate the resume PDF - job body for /save-resume"""
+    try:
         # Generate unique filename
         file_id = secrets.token_hex(8)
         pdf_filename = f"{file_id}_resume.pdf"
@@ -155,18 +628,18 @@ def save_resume():
         
         resume_files_info.append(pdf_filename)
         
-        return jsonify({
+        return {
             'success': True,
             'message': 'Resume created successfully!',
             'pdf_file': pdf_filename,
             'download_url': f'/download-resume/{pdf_filename}'
-        })
+        }
         
     except Exception as e:
         print(f"Resume creation error: {str(e)}")
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'success': False, 'error': f'Resume creation failed: {str(e)}'})
+        return {'success': False, 'error': f'Resume creation failed: {str(e)}'}
 
 def create_resume_pdf_fixed(resume_data, template, include_photo, photo_data, output_path):
     """Fixed PDF creation function with PROPER CONTACT INFORMATION LINE BREAKS"""
@@ -177,7 +650,6 @@ def create_resume_pdf_fixed(resume_data, template, include_photo, photo_data, ou
         from reportlab.lib import colors
         from reportlab.lib.utils import ImageReader
         import base64
-        from io import BytesIO
         
         # Create PDF with canvas
         c = canvas.Canvas(output_path, pagesize=A4)
@@ -221,7 +693,8 @@ def create_resume_pdf_fixed(resume_data, template, include_photo, photo_data, ou
                     photo_data = photo_data.split(',')[1]
                 
                 photo_bytes = base64.b64decode(photo_data)
-                photo_img = ImageReader(BytesIO(photo_bytes))
+                # Printed at ~1.2 inch - 400 px is plenty at 300 DPI
+                photo_img = ImageReader(open_image(photo_bytes, target_size=(400, 400)))
                 
                 # Photo positioning based on template
                 if template in ['4', '8']:  # Two-column templates
@@ -696,72 +1169,541 @@ def simple_download_resume():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+# ==================== BACKGROUND REMOVAL SESSIONS ====================
+
+rembg_sessions = {}
+rembg_sessions_lock = threading.Lock()
+# Failed session loads per model - the GrabCut fallback keeps requests working, so /metrics makes this visible
+rembg_session_errors = {}
+
+def get_rembg_session(model_name=None):
+    """Shared rembg session per model - the ONNX model is loaded once per process"""
+    model_name = model_name or app.config['REMBG_MODEL']
+    session = rembg_sessions.get(model_name)
+    if session is not None:
+        return session
+    
+    with rembg_sessions_lock:
+        session = rembg_sessions.get(model_name)
+        if session is None:
+            import onnxruntime as ort
+            from rembg.sessions import sessions_class
+            
+            sess_opts = ort.SessionOptions()
+            sess_opts.intra_op_num_threads = app.config['ORT_INTRA_OP_THREADS']
+            sess_opts.inter_op_num_threads = app.config['ORT_INTER_OP_THREADS']
+            
+            # new_session() builds its own SessionOptions in rembg 2.0.50, so the class is created directly;
+            # (model_name, sess_opts) is the constructor signature across 2.0.x
+            session_class = next((cls for cls in sessions_class if cls.name() == model_name), None)
+            start_time = time.time()
+            try:
+                if session_class is None:
+                    raise ValueError(f"Unknown rembg model '{model_name}'")
+                session = session_class(model_name, sess_opts)
+            except Exception as e:
+                rembg_session_errors[model_name] = rembg_session_errors.get(model_name, 0) + 1
+                print(f"ERROR: could not load rembg session {model_name} "
+                      f"(failure #{rembg_session_errors[model_name]}): {type(e).__name__}: {str(e)}")
+                raise
+            rembg_sessions[model_name] = session
+            print(f"Loaded rembg session {model_name} in {time.time() - start_time:.2f}s "
+                  f"(intra-op {sess_opts.intra_op_num_threads}, inter-op {sess_opts.inter_op_num_threads})")
+    return session
+
+class InflightCounter:
+    """Thread-safe count of work in progress, used as a context manager"""
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+    
+    def __enter__(self):
+        with self.lock:
+            self.value += 1
+        return self
+    
+    def __exit__(self, *exc):
+        with self.lock:
+            self.value -= 1
+        return False
+
+segmentations_inflight = InflightCounter()
+
+# Job kinds that run background removal
+SEGMENTATION_JOB_KINDS = {'passport_photo'}
+
+def segmentation_queue_depth():
+    """Segmentations running or waiting: queued passport jobs plus calls inside predict_alpha_mask.
+    
+    Broker queue entries are callers already counted as in flight. With INFERENCE_SOCKETS the
+    servers' in-flight count is used when larger, since it includes the other web workers' requests.
+    """
+    in_flight = segmentations_inflight.value
+    if inference_client is not None:
+        in_flight = max(in_flight, inference_client.server_depth())
+    return job_manager.pending(SEGMENTATION_JOB_KINDS) + in_flight
+
+def select_rembg_model(quality=None):
+    """Pick the rembg model for a quality tier, dropping to the fast tier under load"""
+    tiers = app.config['REMBG_MODEL_TIERS']
+    quality = (quality or app.config['PASSPORT_QUALITY']).lower()
+    if quality not in tiers:
+        quality = app.config['PASSPORT_QUALITY'] if app.config['PASSPORT_QUALITY'] in tiers else 'best'
+    
+    if quality != 'fast':
+        depth = segmentation_queue_depth()
+        if depth >= app.config['REMBG_DOWNGRADE_DEPTH']:
+            print(f"Segmentation queue depth {depth}, using fast model")
+            quality = 'fast'
+    
+    return tiers[quality], quality
+
+class LatencyTracker:
+    """Recent latencies (ms) within a sliding time window"""
+    def __init__(self, window_seconds=30, max_samples=200):
+        self.window = window_seconds
+        self.samples = deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+    
+    def record(self, ms):
+        with self.lock:
+            self.samples.append((time.time(), ms))
+    
+    def percentile(self, pct=90):
+        """None when there are no samples inside the window"""
+        cutoff = time.time() - self.window
+        with self.lock:
+            recent = sorted(ms for ts, ms in self.samples if ts >= cutoff)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * pct / 100))]
+
+segmentation_latency = LatencyTracker()
+degraded_counts = {'queue': 0, 'latency': 0, 'forced': 0, 'error': 0}
+
+def choose_segmenter():
+    """'rembg' normally, ('grabcut', reason) while the inference path is overloaded"""
+    mode = app.config['DEGRADED_MODE']
+    if mode == 'off':
+        return 'rembg', None
+    if mode == 'always':
+        return 'grabcut', 'forced'
+    
+    if segmentation_queue_depth() >= app.config['REMBG_DEGRADE_DEPTH']:
+        return 'grabcut', 'queue'
+    
+    # Old samples age out of the window, so rembg is retried once a slow spell has passed
+    p90 = segmentation_latency.percentile(90)
+    if p90 is not None and p90 > app.config['REMBG_LATENCY_SLO_MS']:
+        return 'grabcut', 'latency'
+    return 'rembg', None
+
+# Models sharing u2net's 320x320 input and output layout - these can be batched
+U2NET_FAMILY = {'u2net', 'u2netp', 'u2net_human_seg'}
+
+class InferenceBroker:
+    """Collects segmentation requests for a few ms and runs them as one batched forward pass"""
+    def __init__(self, window_ms=10, max_batch=8, workers=1):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.unbatchable = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+    
+    def submit(self, model_name, tensor):
+        """Queue a normalized (1, 3, H, W) input, returns a Future for the raw (H, W) prediction"""
+        self._start()
+        future = Future()
+        self.queue.put((model_name, tensor, future))
+        return future
+    
+    def _start(self):
+        if len(self.threads) >= self.workers:
+            return
+        with self.lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+    
+    def _dispatch_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(item[0], []).append(item)
+            for model_name, items in by_model.items():
+                self._run_batch(model_name, items)
+    
+    def _run_batch(self, model_name, items):
+        # Callers that timed out cancelled their futures - skip them
+        items = [item for item in items if item[2].set_running_or_notify_cancel()]
+        if not items:
+            return
+        try:
+            session = get_rembg_session(model_name).inner_session
+            input_name = session.get_inputs()[0].name
+            
+            preds = None
+            if len(items) > 1 and model_name not in self.unbatchable:
+                try:
+                    batch = np.concatenate([tensor for _, tensor, _ in items])
+                    preds = session.run(None, {input_name: batch})[0][:, 0, :, :]
+                except Exception as e:
+                    # Model exported with a fixed batch of 1 - run items one by one from now on
+                    print(f"Batched inference unavailable for {model_name}: {e}")
+                    self.unbatchable.add(model_name)
+            if preds is None:
+                preds = [session.run(None, {input_name: tensor})[0][0, 0, :, :] for _, tensor, _ in items]
+            
+            for (_, _, future), pred in zip(items, preds):
+                future.set_result(pred)
+            
+            with self.lock:
+                self.batches += 1
+                self.items += len(items)
+                self.largest_batch = max(self.largest_batch, len(items))
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch,
+                'batches': self.batches,
+                'items': self.items,
+                'largest_batch': self.largest_batch,
+                'avg_batch': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'queued': self.queue.qsize()
+            }
+
+inference_broker = InferenceBroker(
+    window_ms=app.config['REMBG_BATCH_WINDOW_MS'],
+    max_batch=app.config['REMBG_MAX_BATCH'],
+    workers=app.config['JOB_WORKERS']
+)
+
+def local_predict_alpha_mask(image, model_name=None):
+    """Foreground mask ('L', same size as image) from an in-process rembg session, batched for u2net-family models"""
+    model_name = model_name or app.config['REMBG_MODEL']
+    session = get_rembg_session(model_name)
+    
+    if model_name not in U2NET_FAMILY or app.config['REMBG_BATCH_WINDOW_MS'] <= 0:
+        return session.predict(image)[0]
+    
+    # Preprocess here so the broker threads only run the forward pass
+    inputs = session.normalize(image, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320))
+    tensor = next(iter(inputs.values()))
+    future = inference_broker.submit(model_name, tensor)
+    try:
+        pred = future.result(timeout=app.config['REMBG_BATCH_TIMEOUT'])
+    except FutureTimeoutError:
+        # Nobody will wait for this mask any more - keep the broker from computing it
+        future.cancel()
+        raise
+    
+    low, high = float(np.min(pred)), float(np.max(pred))
+    pred = (pred - low) / max(high - low, 1e-6)
+    mask = Image.fromarray((pred.clip(0, 1) * 255).astype('uint8'), mode='L')
+    return mask.resize(image.size, Image.Resampling.LANCZOS)
+
+class InferenceClient:
+    """Round-robin client for inference_server.py workers on local Unix sockets"""
+    def __init__(self, addresses, authkey, timeout=30):
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.idle = {address: [] for address in self.addresses}
+        self.next_index = 0
+        self.requests = 0
+        self.errors = 0
+        self.depth = 0
+        self.depth_checked_at = 0.0
+    
+    def _acquire(self, address):
+        with self.lock:
+            if self.idle[address]:
+                return self.idle[address].pop()
+        return Client(address, family='AF_UNIX', authkey=self.authkey)
+    
+    def _release(self, address, conn):
+        with self.lock:
+            self.idle[address].append(conn)
+    
+    def predict(self, image, model_name):
+        """Send raw pixels to a worker, returns the 'L' mask - tries each worker once"""
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGB')
+        payload = ('predict', model_name, image.mode, image.size, image.tobytes())
+        
+        with self.lock:
+            start = self.next_index
+            self.next_index = (self.next_index + 1) % len(self.addresses)
+            self.requests += 1
+        
+        last_error = None
+        for offset in range(len(self.addresses)):
+            address = self.addresses[(start + offset) % len(self.addresses)]
+            try:
+                conn = self._acquire(address)
+            except OSError as e:
+                last_error = e
+                continue
+            try:
+                conn.send(payload)
+                if not conn.poll(self.timeout):
+                    raise TimeoutError(f'Inference worker {address} timed out')
+                status, value = conn.recv()
+            except TimeoutError:
+                # Worker is alive but busy - retrying elsewhere would only double the wait
+                conn.close()
+                raise
+            except (OSError, EOFError) as e:
+                conn.close()
+                last_error = e
+                continue
+            except Exception:
+                conn.close()
+                raise
+            
+            self._release(address, conn)
+            if status != 'ok':
+                raise RuntimeError(value)
+            return Image.frombytes('L', image.size, value)
+        
+        with self.lock:
+            self.errors += 1
+        raise ConnectionError(f'No inference worker reachable: {last_error}')
+    
+    def server_depth(self, max_age=1.0):
+        """Segmentations in flight across all inference servers, refreshed at most once per max_age seconds"""
+        now = time.time()
+        with self.lock:
+            if now - self.depth_checked_at < max_age:
+                return self.depth
+            self.depth_checked_at = now
+        
+        depth = 0
+        for address in self.addresses:
+            try:
+                conn = self._acquire(address)
+            except OSError:
+                continue
+            try:
+                conn.send(('depth',))
+                if not conn.poll(1.0):
+                    raise TimeoutError(f'Inference worker {address} timed out')
+                status, value = conn.recv()
+            except (OSError, EOFError, TimeoutError):
+                conn.close()
+                continue
+            self._release(address, conn)
+            if status == 'ok':
+                depth += value
+        
+        with self.lock:
+            self.depth = depth
+        return depth
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'sockets': self.addresses,
+                'requests': self.requests,
+                'errors': self.errors,
+                'idle_connections': sum(len(conns) for conns in self.idle.values())
+            }
+
+inference_client = InferenceClient(
+    app.config['INFERENCE_SOCKETS'],
+    app.config['INFERENCE_AUTHKEY'],
+    timeout=app.config['REMBG_BATCH_TIMEOUT']
+) if app.config['INFERENCE_SOCKETS'] else None
+
+def predict_alpha_mask(image, model_name=None):
+    """Foreground mask ('L', same size as image) - from the inference workers when configured, else in-process"""
+    model_name = model_name or app.config['REMBG_MODEL']
+    with segmentations_inflight:
+        if inference_client is not None:
+            return inference_client.predict(image, model_name)
+        return local_predict_alpha_mask(image, model_name)
+
+def cutout_with_mask(image, mask):
+    """Transparent-background cutout, same as rembg's default naive cutout"""
+    empty = Image.new('RGBA', image.size, 0)
+    return Image.composite(image.convert('RGBA'), empty, mask)
+
+def mask_cache_id(image_bytes, model_name, variant):
+    """Content hash of the uploaded image, model and pipeline variant - the mask_id returned to clients"""
+    return hashlib.sha256(image_bytes + f'|{model_name}|{variant}'.encode()).hexdigest()[:32]
+
 # ==================== PASSPORT PHOTO AI ROUTES - IMPROVED ====================
 
+def read_passport_image():
+    """Image bytes, parameters and response mode from a JSON data URL, multipart upload or raw image/* body"""
+    if request.is_json:
+        params = request.get_json(silent=True) or {}
+        image_data = params.get('image')
+        image_bytes = None
+        if image_data:
+            # Remove data URL prefix
+            if ',' in image_data:
+                image_data = image_data.split(',')[1]
+            image_bytes = base64.b64decode(image_data)
+        default_mode = 'json'
+    elif request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        params = request.form.to_dict()
+        file = request.files.get('image') or request.files.get('file')
+        image_bytes = file.read() if file else None
+        default_mode = 'binary'
+    elif request.mimetype.startswith('image/'):
+        params = request.args.to_dict()
+        image_bytes = request.get_data()
+        default_mode = 'binary'
+    else:
+        params = request.args.to_dict()
+        image_bytes = None
+        default_mode = 'json'
+    
+    # Form and query values arrive as strings
+    if isinstance(params.get('crop_data'), str):
+        try:
+            params['crop_data'] = json.loads(params['crop_data'])
+        except ValueError:
+            params['crop_data'] = {}
+    
+    mode = (params.get('response') or request.args.get('response') or default_mode).lower()
+    if mode not in ('json', 'binary', 'artifact'):
+        mode = default_mode
+    return image_bytes or None, params, mode
+
+def passport_image_response(png_bytes, fields, mode, filename=None):
+    """Return a PNG as raw bytes (metadata in X- headers), a saved artifact URL, or the legacy base64 JSON"""
+    if mode == 'binary':
+        response = send_file(io.BytesIO(png_bytes), mimetype='image/png', download_name=filename or 'passport.png')
+        for key, value in fields.items():
+            if value is not None and not isinstance(value, (dict, list)):
+                response.headers['X-' + key.replace('_', '-').title()] = str(value)
+        return response
+    
+    if mode == 'artifact':
+        if filename is None:
+            filename = f"{secrets.token_hex(8)}_processed.png"
+            with open(os.path.join(app.config['PASSPORT_FOLDER'], filename), 'wb') as f:
+                f.write(png_bytes)
+            passport_files_info.append(filename)
+        return jsonify(dict(
+            fields,
+            success=True,
+            filename=filename,
+            preview_url=url_for('preview_passport_file', filename=filename),
+            download_url=url_for('download_passport_file', filename=filename)
+        ))
+    
+    image_base64 = base64.b64encode(png_bytes).decode('utf-8')
+    return jsonify(dict(fields, success=True, image=f"data:image/png;base64,{image_base64}"))
+
 @app.route('/process-image', methods=['POST'])
 def process_image_ai():
     """ULTRA FAST AI background removal - MAX SPEED VERSION"""
     try:
         start_time = time.time()
         
-        data = request.json
-        image_data = data.get('image')
+        # JSON data URL (legacy), multipart upload or raw image/* body
+        image_bytes, data, response_mode = read_passport_image()
         
-        if not image_data:
+        if not image_bytes:
             return jsonify({'success': False, 'error': 'No image data provided'})
         
-        # Fast processing
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
+        model_name, quality = select_rembg_model(data.get('quality'))
+        refine_edges = str(data.get('refine_edges', app.config['PASSPORT_EDGE_REFINE'])).lower() == 'true'
         
-        image_bytes = base64.b64decode(image_data)
+        # Same photo seen before - reuse its segmentation
+        mask_id = mask_cache_id(image_bytes, model_name, 'inline-matte' if refine_edges else 'inline')
+        output_image = mask_cache.get(mask_id)
         
-        # Direct processing
         from io import BytesIO
-        input_image = Image.open(BytesIO(image_bytes))
-        
-        # Speed optimization: Smaller size for faster processing
-        original_size = input_image.size
-        if max(original_size) > 600:
-            input_image.thumbnail((600, 600), Image.Resampling.LANCZOS)
+        if output_image is not None:
+            method = "cached"
+        else:
+            # Direct processing
+            max_side = app.config['PASSPORT_MAX_SIDE']
+            input_image = open_image(image_bytes, target_size=(max_side, max_side))
+            
+            # Keep the photo at print resolution - only the segmentation runs on a small copy
+            if max(input_image.size) > max_side:
+                input_image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            
+            # Fast background removal
+            try:
+                mask, segmenter = segment_full_resolution(input_image, model_name)
+                if refine_edges:
+                    mask = refine_alpha_edges(input_image, mask)
+                output_image = cutout_with_mask(input_image, mask)
+                if output_image.mode != 'RGBA':
+                    output_image = output_image.convert('RGBA')
+                if segmenter == 'rembg':
+                    method = "rembg_fast"
+                    mask_cache.set(mask_id, output_image)
+                else:
+                    # Degraded results aren't cached - the next request gets the real model
+                    method = segmenter
+                    mask_id = None
+            except:
+                # Ultra fast fallback
+                if input_image.mode != 'RGBA':
+                    input_image = input_image.convert('RGBA')
+                output_image = input_image
+                method = "direct_fallback"
+                mask_id = None
         
-        # Fast background removal
-        try:
-            output_image = remove(input_image)
-            if output_image.mode != 'RGBA':
-                output_image = output_image.convert('RGBA')
-            method = "rembg_fast"
-        except:
-            # Ultra fast fallback
-            if input_image.mode != 'RGBA':
-                input_image = input_image.convert('RGBA')
-            output_image = input_image
-            method = "direct_fallback"
-        
-        # Fast base64 conversion
         buffered = BytesIO()
         output_image.save(buffered, format="PNG", optimize=True)
-        processed_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
         
         processing_time = time.time() - start_time
         
-        return jsonify({
-            'success': True,
-            'image': f"data:image/png;base64,{processed_base64}",
+        return passport_image_response(buffered.getvalue(), {
             'processing_time': f"{processing_time:.2f}s",
+            'method': method,
+            'model': model_name,
+            'quality': quality,
+            'edge_refine': refine_edges,
+            'mask_id': mask_id,
             'message': f'Ultra fast processing in {processing_time:.2f} seconds!'
-        })
+        }, response_mode)
         
     except Exception as e:
         return jsonify({'success': False, 'error': f'Processing failed: {str(e)}'})
 
 # ==================== IMPROVED BACKGROUND REMOVAL ====================
 
-def remove_background_improved(image_path):
+def remove_background_improved(image_path, model_name=None, refine_edges=False):
     """Improved background removal with better quality preservation"""
     try:
-        # Read image
-        input_image = Image.open(image_path)
+        # Read image - decoded at reduced scale for large phone photos
+        max_side = app.config['PASSPORT_MAX_SIDE']
+        input_image = open_image(image_path, target_size=(max_side, max_side))
+        if max(input_image.size) > max_side:
+            input_image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
         
         # Convert to RGB if necessary
         if input_image.mode != 'RGB':
@@ -769,18 +1711,21 @@ def remove_background_improved(image_path):
         
         # Try to use rembg if available
         try:
-            from rembg import remove
             print("Using rembg for background removal...")
             
-            # Remove background
-            output_image = remove(input_image)
+            # Remove background with the shared session (GrabCut when overloaded)
+            mask, segmenter = segment_full_resolution(input_image, model_name)
+            if refine_edges:
+                # Hair and fine edges matted from the image colours
+                mask = refine_alpha_edges(input_image, mask)
+            output_image = cutout_with_mask(input_image, mask)
             
             # Ensure the output is in RGBA mode for transparency
             if output_image.mode != 'RGBA':
                 output_image = output_image.convert('RGBA')
             
-            print("Background removal successful")
-            return output_image, "rembg_success"
+            print(f"Background removal successful ({segmenter})")
+            return output_image, "rembg_success" if segmenter == 'rembg' else segmenter
             
         except ImportError:
             print("Rembg not available, using fallback method")
@@ -790,7 +1735,173 @@ def remove_background_improved(image_path):
     except Exception as e:
         print(f"Background removal failed: {e}")
         # Ultimate fallback - return original image
-        return Image.open(image_path).convert('RGBA'), "fallback_error"
+        return open_image(image_path).convert('RGBA'), "fallback_error"
+
+def guided_filter(guide, src, radius, eps=1e-4):
+    """Edge-aware smoothing of src following guide (He et al.), float32 arrays in 0..1"""
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean_i = cv2.blur(guide, ksize)
+    mean_p = cv2.blur(src, ksize)
+    cov_ip = cv2.blur(guide * src, ksize) - mean_i * mean_p
+    var_i = cv2.blur(guide * guide, ksize) - mean_i * mean_i
+    
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    return cv2.blur(a, ksize) * guide + cv2.blur(b, ksize)
+
+def grabcut_alpha_mask(image, side=160, iterations=3):
+    """CPU fallback segmenter: GrabCut colour models seeded with a portrait frame (and the face, if found).
+    
+    Runs at side px (~100 ms on one core); the mask comes back at that size for upsample_mask.
+    """
+    image = image.convert('RGB')
+    image.thumbnail((side, side), Image.Resampling.BILINEAR)
+    pixels = np.ascontiguousarray(np.asarray(image))
+    h, w = pixels.shape[:2]
+    
+    # Outside a centred portrait frame is background; the subject usually reaches the bottom edge
+    mask = np.full((h, w), cv2.GC_BGD, np.uint8)
+    left, top = int(w * 0.05), int(h * 0.03)
+    mask[top:, left:w - left] = cv2.GC_PR_FGD
+    
+    face = detect_face(image)
+    if face:
+        fx, fy, fw, fh = face
+        mask[fy + fh // 6:fy + fh, fx + fw // 6:fx + fw - fw // 6] = cv2.GC_FGD
+    
+    bgd_model = np.zeros((1, 65), np.float64)
+    fgd_model = np.zeros((1, 65), np.float64)
+    cv2.grabCut(pixels, mask, None, bgd_model, fgd_model, iterations, cv2.GC_INIT_WITH_MASK)
+    
+    alpha = np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+    return Image.fromarray(cv2.GaussianBlur(alpha, (3, 3), 0), mode='L')
+
+def segment_full_resolution(image, model_name=None):
+    """Segment a small copy and return (mask at the image's full size, method).
+    
+    method is 'rembg', 'grabcut_degraded' when the policy sheds load, or 'grabcut_fallback' if rembg failed.
+    """
+    side = app.config['SEGMENTATION_SIDE']
+    small = image.convert('RGB')
+    small.thumbnail((side, side), Image.Resampling.LANCZOS)
+    
+    segmenter, reason = choose_segmenter()
+    if segmenter == 'rembg':
+        start_time = time.time()
+        try:
+            mask = predict_alpha_mask(small, model_name)
+            method = 'rembg'
+        except Exception as e:
+            print(f"rembg segmentation failed, using GrabCut: {e}")
+            degraded_counts['error'] += 1
+            mask = grabcut_alpha_mask(small)
+            method = 'grabcut_fallback'
+        finally:
+            segmentation_latency.record((time.time() - start_time) * 1000)
+    else:
+        print(f"Degraded mode ({reason}): using GrabCut")
+        degraded_counts[reason] += 1
+        mask = grabcut_alpha_mask(small)
+        method = 'grabcut_degraded'
+    
+    return upsample_mask(image, mask), method
+
+def upsample_mask(image, mask):
+    """Guided upsample of a low-resolution mask to the image's full size"""
+    if mask.size == image.size:
+        return mask
+    
+    # Bilinear upsample, then snap the soft edge to the full-resolution pixels.
+    # The window must span the upsampled edge ramp; only the uncertain band is replaced
+    # so the filter's smoothing doesn't leak into solid foreground/background.
+    coarse = np.asarray(mask.resize(image.size, Image.Resampling.BILINEAR), dtype=np.float32) / 255.0
+    guide = np.asarray(image.convert('L'), dtype=np.float32) / 255.0
+    radius = max(2, round(2 * max(image.size) / max(mask.size)))
+    band = (coarse > 0.02) & (coarse < 0.98)
+    refined = np.where(band, guided_filter(guide, coarse, radius), coarse)
+    
+    return Image.fromarray((np.clip(refined, 0, 1) * 255).astype(np.uint8), mode='L')
+
+def color_guided_filter(guide, src, radius, eps=1e-4, subsample=4):
+    """Fast guided filter with an RGB guide (He & Sun 2015): coefficients at 1/subsample, applied at full size.
+    
+    guide is float32 (H, W, 3), src float32 (H, W), both in 0..1.
+    """
+    h, w = src.shape
+    hs, ws = max(1, h // subsample), max(1, w // subsample)
+    ksize = (2 * max(1, radius // subsample) + 1,) * 2
+    small = cv2.resize(guide, (ws, hs), interpolation=cv2.INTER_AREA)
+    p = cv2.resize(src, (ws, hs), interpolation=cv2.INTER_AREA)
+    
+    mean_i = cv2.blur(small, ksize)
+    mean_p = cv2.blur(p, ksize)
+    cov = cv2.blur(small * p[:, :, None], ksize) - mean_i * mean_p[:, :, None]
+    
+    r, g, b = small[:, :, 0], small[:, :, 1], small[:, :, 2]
+    def var(x, y, i, j):
+        return cv2.blur(x * y, ksize) - mean_i[:, :, i] * mean_i[:, :, j]
+    rr, rg, rb = var(r, r, 0, 0) + eps, var(r, g, 0, 1), var(r, b, 0, 2)
+    gg, gb, bb = var(g, g, 1, 1) + eps, var(g, b, 1, 2), var(b, b, 2, 2) + eps
+    
+    # Per-pixel inverse of the symmetric 3x3 covariance via cofactors (much faster than np.linalg.solve)
+    inv_rr, inv_rg, inv_rb = gg * bb - gb * gb, gb * rb - rg * bb, rg * gb - gg * rb
+    inv_gg, inv_gb, inv_bb = rr * bb - rb * rb, rb * rg - rr * gb, rr * gg - rg * rg
+    det = rr * inv_rr + rg * inv_rg + rb * inv_rb
+    c0, c1, c2 = cov[:, :, 0], cov[:, :, 1], cov[:, :, 2]
+    a = np.dstack((
+        (inv_rr * c0 + inv_rg * c1 + inv_rb * c2) / det,
+        (inv_rg * c0 + inv_gg * c1 + inv_gb * c2) / det,
+        (inv_rb * c0 + inv_gb * c1 + inv_bb * c2) / det
+    ))
+    b_coef = mean_p - (a * mean_i).sum(axis=2)
+    
+    mean_a = cv2.resize(cv2.blur(a, ksize), (w, h), interpolation=cv2.INTER_LINEAR)
+    mean_b = cv2.resize(cv2.blur(b_coef, ksize), (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.einsum('hwc,hwc->hw', mean_a, guide) + mean_b
+
+def fast_downscale(array, size):
+    """Area-average by the largest integer factor (OpenCV's fast path), then bilinear to the exact size"""
+    factor = int(min(array.shape[1] / size[0], array.shape[0] / size[1]))
+    if factor >= 2:
+        array = cv2.resize(array, (array.shape[1] // factor, array.shape[0] // factor), interpolation=cv2.INTER_AREA)
+    return cv2.resize(array, size, interpolation=cv2.INTER_LINEAR)
+
+def refine_alpha_edges(image, mask):
+    """Trimap from the segmentation mask, colour-guided matting on the uncertain band only.
+    
+    Works at up to MATTE_SIDE px and only replaces the band at full size
+    (~30 ms for a 3 MP photo at the default 768 px, ~100 ms at 12 MP).
+    """
+    full_w, full_h = image.size
+    scale = min(1.0, app.config['MATTE_SIDE'] / max(image.size))
+    w, h = max(1, int(full_w * scale)), max(1, int(full_h * scale))
+    
+    # Full-size passes cost more than the matting itself unless they stay on OpenCV's fast paths
+    rgb = np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+    full_mask = np.asarray(mask)
+    guide = fast_downscale(rgb, (w, h)).astype(np.float32) / 255.0
+    coarse = fast_downscale(full_mask, (w, h)).astype(np.float32) / 255.0
+    
+    # Trimap: confident regions shrunk by the band width, everything between is unknown
+    band = max(2, int(round(h * 0.01)))
+    kernel = np.ones((2 * band + 1, 2 * band + 1), np.uint8)
+    sure_fg = cv2.erode((coarse > 0.95).astype(np.uint8), kernel).astype(bool)
+    sure_bg = cv2.erode((coarse < 0.05).astype(np.uint8), kernel).astype(bool)
+    unknown = ~(sure_fg | sure_bg)
+    if not unknown.any():
+        return mask
+    
+    seed = np.where(sure_fg, 1.0, np.where(sure_bg, 0.0, coarse)).astype(np.float32)
+    matte = color_guided_filter(guide, seed, radius=max(2, int(round(h * 0.05))))
+    refined = (np.where(unknown, np.clip(matte, 0, 1), seed) * 255 + 0.5).astype(np.uint8)
+    
+    if (w, h) == mask.size:
+        return Image.fromarray(refined, mode='L')
+    
+    # Back to full size, touching only the uncertain band
+    refined_full = cv2.resize(refined, mask.size, interpolation=cv2.INTER_LINEAR)
+    band_full = cv2.resize(unknown.astype(np.uint8), mask.size, interpolation=cv2.INTER_NEAREST).astype(bool)
+    return Image.fromarray(np.where(band_full, refined_full, full_mask), mode='L')
 
 def simple_background_removal(input_image):
     """Simple background removal using edge detection and masking"""
@@ -830,48 +1941,132 @@ def simple_background_removal(input_image):
         rgba_array = np.dstack((img_array, alpha))
         return Image.fromarray(rgba_array, 'RGBA')
 
+# ==================== FACE AUTO-CROP ====================
+
+face_detector = None
+face_detector_lock = threading.Lock()
+
+def get_face_detector():
+    """Haar cascade loaded once per process, None if the cascade file is missing"""
+    global face_detector
+    if face_detector is None:
+        with face_detector_lock:
+            if face_detector is None:
+                try:
+                    cascade = cv2.CascadeClassifier(app.config['FACE_CASCADE_PATH'])
+                    if cascade.empty():
+                        raise ValueError(f"cascade not found at {app.config['FACE_CASCADE_PATH']}")
+                except Exception as e:
+                    # OpenCV builds without the objdetect cascades (e.g. 5.x wheels)
+                    print(f"Face detector unavailable, auto-crop disabled: {e}")
+                    cascade = False
+                face_detector = cascade
+    return face_detector or None
+
+def detect_face(image, detect_side=480):
+    """Largest face as (x, y, w, h) in image pixels, or None"""
+    detector = get_face_detector()
+    if detector is None:
+        return None
+    
+    # Detect on a small grayscale copy - tens of ms even for phone photos
+    small = image.convert('L')
+    small.thumbnail((detect_side, detect_side), Image.Resampling.BILINEAR)
+    scale = image.width / small.width
+    gray = cv2.equalizeHist(np.asarray(small))
+    
+    min_side = max(24, min(small.size) // 8)
+    # CascadeClassifier isn't safe to share across threads
+    with face_detector_lock:
+        faces = detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side))
+    if len(faces) == 0:
+        return None
+    
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    return tuple(int(round(v * scale)) for v in (x, y, w, h))
+
+def face_crop_box(image, size_px, face=None):
+    """Head-and-shoulders crop box with the aspect ratio of size_px, or None when no face is found"""
+    face = face or detect_face(image)
+    if face is None:
+        return None
+    
+    fx, fy, fw, fh = face
+    target_w, target_h = size_px
+    
+    # Detected face box ~45% of the photo height, starting ~28% down (leaves room for hair above)
+    crop_h = fh / 0.45
+    crop_w = crop_h * target_w / target_h
+    
+    # Shrink to fit inside the photo, keeping the aspect ratio
+    fit = min(1.0, image.width / crop_w, image.height / crop_h)
+    crop_w, crop_h = crop_w * fit, crop_h * fit
+    
+    left = fx + fw / 2 - crop_w / 2
+    top = fy - 0.28 * crop_h
+    left = min(max(0, left), image.width - crop_w)
+    top = min(max(0, top), image.height - crop_h)
+    
+    return (int(left), int(top), int(left + crop_w), int(top + crop_h))
+
 # ==================== PASSPORT PHOTO CREATION ====================
 
+# Passport sizes in pixels (width, height) at 300 DPI
+PASSPORT_SIZES_PX = {
+    '2x2': (600, 600),
+    '3.5x4.5': (413, 531),
+    '3x4': (354, 472),
+    'custom_413x531': (413, 531),
+    'custom_600x600': (600, 600),
+    'custom_354x472': (354, 472)
+}
+
+def parse_bg_color(bg_color):
+    """RGB tuple for a '#rrggbb' background, None for 'transparent', white otherwise"""
+    if bg_color == 'transparent':
+        return None
+    if isinstance(bg_color, str) and bg_color.startswith('#'):
+        bg_color_hex = bg_color.lstrip('#')
+        return tuple(int(bg_color_hex[i:i+2], 16) for i in (0, 2, 4))
+    return (255, 255, 255)
+
+def passport_fit_box(image_size, size_px):
+    """Size and top-left offset that fit image_size inside size_px, keeping the aspect ratio"""
+    width_px, height_px = size_px
+    img_ratio = image_size[0] / image_size[1]
+    passport_ratio = width_px / height_px
+    
+    if img_ratio > passport_ratio:
+        # Image is wider, scale by width
+        new_width = width_px
+        new_height = int(width_px / img_ratio)
+    else:
+        # Image is taller, scale by height
+        new_height = height_px
+        new_width = int(height_px * img_ratio)
+    
+    return (new_width, new_height), ((width_px - new_width) // 2, (height_px - new_height) // 2)
+
 def create_passport_photo_improved(image, size_px=(600, 600), bg_color='#FFFFFF'):
     """Create passport photo with improved background handling"""
     try:
         width_px, height_px = size_px
         
         # Handle background color
-        if bg_color == 'transparent':
+        bg_color_rgb = parse_bg_color(bg_color)
+        if bg_color_rgb is None:
             # Create transparent background
             result = Image.new('RGBA', (width_px, height_px), (255, 255, 255, 0))
         else:
-            # Convert hex to RGB if needed
-            if isinstance(bg_color, str) and bg_color.startswith('#'):
-                bg_color_hex = bg_color.lstrip('#')
-                bg_color_rgb = tuple(int(bg_color_hex[i:i+2], 16) for i in (0, 2, 4))
-            else:
-                bg_color_rgb = (255, 255, 255)  # Default white
-            
             # Create solid background
             result = Image.new('RGB', (width_px, height_px), bg_color_rgb)
         
         # Calculate scaling to fit within passport photo while maintaining aspect ratio
-        img_ratio = image.width / image.height
-        passport_ratio = width_px / height_px
-        
-        if img_ratio > passport_ratio:
-            # Image is wider, scale by width
-            new_width = width_px
-            new_height = int(width_px / img_ratio)
-        else:
-            # Image is taller, scale by height
-            new_height = height_px
-            new_width = int(height_px * img_ratio)
+        (new_width, new_height), (x, y) = passport_fit_box(image.size, size_px)
         
         # Resize image with high quality
         img_resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
         
-        # Calculate position to center the image
-        x = (width_px - new_width) // 2
-        y = (height_px - new_height) // 2
-        
         # Paste onto result
         if img_resized.mode == 'RGBA' and result.mode == 'RGBA':
             result.paste(img_resized, (x, y), img_resized)
@@ -889,76 +2084,83 @@ def create_passport_photo_improved(image, size_px=(600, 600), bg_color='#FFFFFF'
         print(f"Passport photo creation error: {e}")
         raise Exception(f"Passport photo creation failed: {str(e)}")
 
+def apply_crop_data(img, crop_data):
+    """Crop to the client's preview rectangle (x, y, width, height at preview scale)"""
+    try:
+        scale = crop_data['scale']
+        x = crop_data['x']
+        y = crop_data['y']
+        width = crop_data['width']
+        height = crop_data['height']
+        
+        # Convert preview coordinates to original image coordinates
+        orig_x = int(x / scale)
+        orig_y = int(y / scale)
+        orig_width = int(width / scale)
+        orig_height = int(height / scale)
+        
+        # Ensure coordinates are within image bounds
+        orig_x = max(0, min(orig_x, img.width - 1))
+        orig_y = max(0, min(orig_y, img.height - 1))
+        orig_width = min(orig_width, img.width - orig_x)
+        orig_height = min(orig_height, img.height - orig_y)
+        
+        if orig_width > 0 and orig_height > 0:
+            # Crop the image
+            img = img.crop((orig_x, orig_y, orig_x + orig_width, orig_y + orig_height))
+            
+    except Exception as crop_error:
+        print(f"Crop processing error: {crop_error}")
+        # Continue without cropping
+    return img
+
 @app.route('/create-passport-photo', methods=['POST'])
 def create_passport_photo_route():
     """Create final passport photo with custom settings - IMPROVED VERSION"""
     try:
-        data = request.json
-        image_data = data.get('image')
+        # JSON data URL (legacy), multipart upload or raw image/* body
+        image_bytes, data, response_mode = read_passport_image()
+        mask_id = data.get('mask_id')
         size_type = data.get('size_type', '2x2')
         bg_color = data.get('bg_color', '#FFFFFF')
         crop_data = data.get('crop_data', {})
+        auto_crop = str(data.get('auto_crop', 'false')).lower() == 'true'
+        
+        # A mask_id from /process-image or /upload-passport-photo replaces the re-upload
+        cutout = mask_cache.get(mask_id) if mask_id else None
+        if mask_id and cutout is None and not image_bytes:
+            return jsonify({'success': False, 'error': 'Processed photo expired, please upload it again'})
           
-        if not image_data:
+        if cutout is None and not image_bytes:
             return jsonify({'success': False, 'error': 'No image data provided'})
         
-        # Remove data URL prefix
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-        
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        
-        # Process image
         file_id = secrets.token_hex(8)
-        temp_filename = f"{file_id}_temp.png"
-        temp_path = os.path.join(app.config['PASSPORT_FOLDER'], temp_filename)
         
-        with open(temp_path, 'wb') as f:
-            f.write(image_bytes)
+        if cutout is None:
+            # Process image
+            temp_filename = f"{file_id}_temp.png"
+            temp_path = os.path.join(app.config['PASSPORT_FOLDER'], temp_filename)
+            
+            with open(temp_path, 'wb') as f:
+                f.write(image_bytes)
         
-        # Define sizes in pixels (width, height)
-        sizes_px = {
-            '2x2': (600, 600),
-            '3.5x4.5': (413, 531),
-            '3x4': (354, 472),
-            'custom_413x531': (413, 531),
-            'custom_600x600': (600, 600),
-            'custom_354x472': (354, 472)
-        }
+        size_px = PASSPORT_SIZES_PX.get(size_type, (600, 600))
         
-        size_px = sizes_px.get(size_type, (600, 600))
+        crop_method = 'manual' if crop_data else 'none'
         
         # Load and process image
-        with Image.open(temp_path) as img:
+        with (cutout.copy() if cutout is not None else open_image(temp_path)) as img:
             # Apply cropping if crop data is provided
             if crop_data and all(k in crop_data for k in ['x', 'y', 'width', 'height', 'scale']):
-                try:
-                    scale = crop_data['scale']
-                    x = crop_data['x']
-                    y = crop_data['y']
-                    width = crop_data['width']
-                    height = crop_data['height']
-                    
-                    # Convert preview coordinates to original image coordinates
-                    orig_x = int(x / scale)
-                    orig_y = int(y / scale)
-                    orig_width = int(width / scale)
-                    orig_height = int(height / scale)
-                    
-                    # Ensure coordinates are within image bounds
-                    orig_x = max(0, min(orig_x, img.width - 1))
-                    orig_y = max(0, min(orig_y, img.height - 1))
-                    orig_width = min(orig_width, img.width - orig_x)
-                    orig_height = min(orig_height, img.height - orig_y)
-                    
-                    if orig_width > 0 and orig_height > 0:
-                        # Crop the image
-                        img = img.crop((orig_x, orig_y, orig_x + orig_width, orig_y + orig_height))
-                        
-                except Exception as crop_error:
-                    print(f"Crop processing error: {crop_error}")
-                    # Continue without cropping
+                img = apply_crop_data(img, crop_data)
+            elif auto_crop:
+                # Frame head and shoulders around the detected face
+                crop_box = face_crop_box(img, size_px)
+                if crop_box:
+                    img = img.crop(crop_box)
+                    crop_method = 'face'
+                else:
+                    crop_method = 'no_face_found'
             
             # Create passport photo with improved function
             passport_photo = create_passport_photo_improved(
@@ -981,24 +2183,142 @@ def create_passport_photo_route():
         
         passport_files_info.append(passport_filename)
         
-        # Convert to base64 for response
         with open(passport_path, 'rb') as f:
-            passport_base64 = base64.b64encode(f.read()).decode('utf-8')
+            passport_png = f.read()
         
-        return jsonify({
-            'success': True,
-            'image': f"data:image/png;base64,{passport_base64}",
+        return passport_image_response(passport_png, {
             'filename': passport_filename,
             'message': f'Passport photo ({size_type}) created successfully!',
             'size': size_type,
             'dimensions': f"{size_px[0]}x{size_px[1]}px",
-            'background': bg_color
-        })
+            'background': bg_color,
+            'crop': crop_method
+        }, response_mode, filename=passport_filename)
         
     except Exception as e:
         print(f"Passport photo creation error: {str(e)}")
         return jsonify({'success': False, 'error': f'Passport photo creation failed: {str(e)}'})
 
+def render_passport_variants(image, size_px, bg_colors):
+    """All backgrounds for one size: resize the foreground once, alpha-blend every color in one NumPy pass"""
+    width_px, height_px = size_px
+    (new_width, new_height), (x, y) = passport_fit_box(image.size, size_px)
+    
+    # Foreground on a transparent canvas of the target size
+    canvas = Image.new('RGBA', size_px, (255, 255, 255, 0))
+    canvas.paste(image.convert('RGBA').resize((new_width, new_height), Image.Resampling.LANCZOS), (x, y))
+    
+    rgba = np.asarray(canvas, dtype=np.float32)
+    alpha = rgba[:, :, 3:4] / 255.0
+    
+    solid = [c for c in bg_colors if parse_bg_color(c) is not None]
+    results = {}
+    if solid:
+        backgrounds = np.array([parse_bg_color(c) for c in solid], dtype=np.float32)[:, None, None, :]
+        blended = rgba[None, :, :, :3] * alpha + backgrounds * (1.0 - alpha)
+        blended = np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+        for color, pixels in zip(solid, blended):
+            results[color] = Image.fromarray(pixels, 'RGB')
+    if len(solid) != len(bg_colors):
+        results['transparent'] = canvas
+    return results
+
+@app.route('/create-passport-variants', methods=['POST'])
+def create_passport_variants():
+    """Several sizes/backgrounds of one photo in a single request"""
+    try:
+        # JSON data URL, multipart upload or raw image/* body - or a mask_id from /process-image
+        image_bytes, data, response_mode = read_passport_image()
+        mask_id = data.get('mask_id')
+        crop_data = data.get('crop_data', {})
+        auto_crop = str(data.get('auto_crop', 'false')).lower() == 'true'
+        
+        variants = data.get('variants') or []
+        if isinstance(variants, str):
+            variants = json.loads(variants)
+        if not variants:
+            return jsonify({'success': False, 'error': 'No variants requested'})
+        if len(variants) > 12:
+            return jsonify({'success': False, 'error': 'At most 12 variants per request'})
+        
+        cutout = mask_cache.get(mask_id) if mask_id else None
+        if cutout is None and not image_bytes:
+            error = 'Processed photo expired, please upload it again' if mask_id else 'No image data provided'
+            return jsonify({'success': False, 'error': error})
+        
+        img = cutout if cutout is not None else open_image(image_bytes)
+        if crop_data and all(k in crop_data for k in ['x', 'y', 'width', 'height', 'scale']):
+            img = apply_crop_data(img, crop_data)
+            auto_crop = False
+        face = detect_face(img) if auto_crop else None
+        
+        # Group backgrounds by size so each size is resized once
+        by_size = {}
+        for variant in variants:
+            size_type = variant.get('size_type', '2x2')
+            bg_color = variant.get('bg_color', '#FFFFFF')
+            by_size.setdefault(size_type, [])
+            if bg_color not in by_size[size_type]:
+                by_size[size_type].append(bg_color)
+        
+        file_id = secrets.token_hex(8)
+        outputs = []
+        for size_type, bg_colors in by_size.items():
+            size_px = PASSPORT_SIZES_PX.get(size_type, (600, 600))
+            source = img
+            if face:
+                source = img.crop(face_crop_box(img, size_px, face))
+            
+            rendered = render_passport_variants(source, size_px, bg_colors)
+            for bg_color in bg_colors:
+                photo = rendered['transparent' if parse_bg_color(bg_color) is None else bg_color]
+                buffered = io.BytesIO()
+                photo.save(buffered, format='PNG')
+                
+                # Only safe characters from client values go into filenames
+                color_tag = ''.join(ch for ch in bg_color if ch.isalnum())
+                size_tag = ''.join(ch for ch in size_type if ch.isalnum() or ch in '._')
+                outputs.append({
+                    'filename': f"{file_id}_passport_{size_tag}_{color_tag}.png",
+                    'size': size_type,
+                    'dimensions': f"{size_px[0]}x{size_px[1]}px",
+                    'background': bg_color,
+                    'png': buffered.getvalue()
+                })
+        
+        if response_mode == 'binary':
+            # All variants in one ZIP (PNGs are already compressed)
+            zip_buffer = io.BytesIO()
+            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as zipf:
+                for output in outputs:
+                    zipf.writestr(output['filename'], output['png'])
+            zip_buffer.seek(0)
+            return send_file(zip_buffer, mimetype='application/zip', as_attachment=True,
+                             download_name=f"{file_id}_passport_variants.zip")
+        
+        results = []
+        for output in outputs:
+            png = output.pop('png')
+            with open(os.path.join(app.config['PASSPORT_FOLDER'], output['filename']), 'wb') as f:
+                f.write(png)
+            passport_files_info.append(output['filename'])
+            output['preview_url'] = url_for('preview_passport_file', filename=output['filename'])
+            output['download_url'] = url_for('download_passport_file', filename=output['filename'])
+            if response_mode == 'json':
+                output['image'] = f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+            results.append(output)
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(results)} passport photo variants created successfully!',
+            'crop': 'manual' if crop_data else ('face' if face else ('no_face_found' if auto_crop else 'none')),
+            'variants': results
+        })
+        
+    except Exception as e:
+        print(f"Passport variants error: {str(e)}")
+        return jsonify({'success': False, 'error': f'Passport variants failed: {str(e)}'})
+
 # ==================== EXISTING PASSPORT PHOTO ROUTES ====================
 
 @app.route('/passport-size-photo-maker')
@@ -1036,8 +2356,37 @@ def upload_passport_photo():
         original_path = os.path.join(app.config['PASSPORT_FOLDER'], original_filename)
         file.save(original_path)
         
-        # Process image (background removal)
-        processed_image, method = remove_background_improved(original_path)
+        # Quality tier: 'fast' or 'best' (server default when omitted)
+        quality = request.form.get('quality')
+        refine_edges = request.form.get('refine_edges', str(app.config['PASSPORT_EDGE_REFINE'])).lower() == 'true'
+        
+        # Background removal runs as a job (?async=true returns a job ID to poll)
+        return run_job('passport_photo', passport_photo_job, file_id, original_filename, original_path, quality, refine_edges)
+        
+    except Exception as e:
+        print(f"Passport photo upload error: {str(e)}")
+        return jsonify({'success': False, 'error': f'Photo processing failed: {str(e)}'})
+
+def passport_photo_job(file_id, original_filename, original_path, quality=None, refine_edges=False):
+    """Background removal for an uploaded passport photo - job body for /upload-passport-photo"""
+    try:
+        # Model is picked when the job runs so queue depth at that moment decides the tier
+        model_name, quality = select_rembg_model(quality)
+        
+        # Same photo seen before - reuse its segmentation
+        with open(original_path, 'rb') as f:
+            mask_id = mask_cache_id(f.read(), model_name, 'upload-matte' if refine_edges else 'upload')
+        processed_image = mask_cache.get(mask_id)
+        
+        if processed_image is not None:
+            method = "cached"
+        else:
+            # Process image (background removal)
+            processed_image, method = remove_background_improved(original_path, model_name, refine_edges)
+            if method == "rembg_success":
+                mask_cache.set(mask_id, processed_image)
+            else:
+                mask_id = None
         
         # Save processed image
         processed_filename = f"{file_id}_processed.png"
@@ -1047,17 +2396,21 @@ def upload_passport_photo():
         
         passport_files_info.extend([original_filename, processed_filename])
         
-        return jsonify({
+        return {
             'success': True,
             'message': 'Photo processed successfully with background removal!',
             'file_id': file_id,
             'processed_file': processed_filename,
-            'method': method
-        })
+            'method': method,
+            'model': model_name,
+            'quality': quality,
+            'edge_refine': refine_edges,
+            'mask_id': mask_id
+        }
         
     except Exception as e:
         print(f"Passport photo upload error: {str(e)}")
-        return jsonify({'success': False, 'error': f'Photo processing failed: {str(e)}'})
+        return {'success': False, 'error': f'Photo processing failed: {str(e)}'}
 
 @app.route('/create-passport-size', methods=['POST'])
 def create_passport_size():
@@ -1122,6 +2475,11 @@ def create_photo_sheet_route():
     """Create sheet with multiple passport photos"""
     try:
         data = request.json
+        
+        # Real paper sizes (4x6, 5x7, A4) go through the packing sheet engine
+        if data.get('paper'):
+            return create_paper_sheet(data)
+        
         passport_file = data.get('passport_file')
         photos_per_sheet = int(data.get('photos_per_sheet', 4))
         size_type = data.get('size_type', '2x2')
@@ -1218,6 +2576,169 @@ def create_photo_sheet_advanced(passport_photo, photos_per_sheet, photo_size_px)
         print(f"Photo sheet creation error: {e}")
         raise Exception(f"Photo sheet creation failed: {str(e)}")
 
+# ==================== PHOTO SHEET ENGINE ====================
+
+SHEET_DPI = 300
+
+# Paper sizes in inches (width, height), portrait
+PAPER_SIZES_IN = {
+    '4x6': (4.0, 6.0),
+    '5x7': (5.0, 7.0),
+    'a4': (8.27, 11.69)
+}
+
+def pack_photo_sheet(items, paper_px, margin_px, gap_px):
+    """Shelf-pack photos onto one sheet.
+    
+    items: list of (key, (width, height), count) in pixels.
+    Returns (placements, overflow): placements are (key, x, y, width, height), tallest photos first.
+    """
+    photos = []
+    for key, size, count in items:
+        photos.extend([(key, size)] * count)
+    photos.sort(key=lambda p: (p[1][1], p[1][0]), reverse=True)
+    
+    paper_w, paper_h = paper_px
+    placements = []
+    overflow = 0
+    shelf_y = margin_px
+    shelf_h = 0
+    cursor_x = margin_px
+    
+    for key, (w, h) in photos:
+        if cursor_x + w > paper_w - margin_px:
+            # Start a new shelf below the current one
+            shelf_y += shelf_h + gap_px
+            shelf_h = 0
+            cursor_x = margin_px
+        if cursor_x + w > paper_w - margin_px or shelf_y + h > paper_h - margin_px:
+            overflow += 1
+            continue
+        placements.append((key, cursor_x, shelf_y, w, h))
+        cursor_x += w + gap_px
+        shelf_h = max(shelf_h, h)
+    
+    return placements, overflow
+
+def layout_photo_sheet(items, paper='4x6', margin_in=0.0, gap_in=0.0):
+    """Pack on the paper in portrait and landscape, keep whichever fits more photos"""
+    paper_w, paper_h = (int(round(v * SHEET_DPI)) for v in PAPER_SIZES_IN[paper])
+    margin_px = int(round(margin_in * SHEET_DPI))
+    gap_px = int(round(gap_in * SHEET_DPI))
+    
+    best = None
+    for paper_px in ((paper_w, paper_h), (paper_h, paper_w)):
+        placements, overflow = pack_photo_sheet(items, paper_px, margin_px, gap_px)
+        if best is None or len(placements) > len(best[1]):
+            best = (paper_px, placements, overflow)
+    return best
+
+def photo_sheet_pdf(photos, paper_px, placements):
+    """Print-ready PDF: each distinct photo is embedded once and drawn at every position"""
+    scale = 72.0 / SHEET_DPI
+    doc = fitz.open()
+    page = doc.new_page(width=paper_px[0] * scale, height=paper_px[1] * scale)
+    
+    xrefs = {}
+    for key, x, y, w, h in placements:
+        rect = fitz.Rect(x * scale, y * scale, (x + w) * scale, (y + h) * scale)
+        if key in xrefs:
+            page.insert_image(rect, xref=xrefs[key])
+        else:
+            xrefs[key] = page.insert_image(rect, stream=photos[key])
+    
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return pdf_bytes
+
+def photo_sheet_png(photos, paper_px, placements):
+    """Raster sheet at 300 DPI on white paper"""
+    sheet = Image.new('RGB', paper_px, 'white')
+    decoded = {}
+    for key, x, y, w, h in placements:
+        if key not in decoded:
+            decoded[key] = Image.open(io.BytesIO(photos[key])).convert('RGBA')
+        sheet.paste(decoded[key], (x, y), decoded[key])
+    return sheet
+
+def create_paper_sheet(data):
+    """Sheet on real paper from one or more passport photos - PDF by default"""
+    paper = str(data.get('paper', '4x6')).lower()
+    if paper not in PAPER_SIZES_IN:
+        return jsonify({'success': False, 'error': f'Paper must be one of: {", ".join(PAPER_SIZES_IN)}'})
+    output_format = str(data.get('format', 'pdf')).lower()
+    
+    # Mixed sheets: [{passport_file, size_type, count}], or the single-photo fields
+    requested = data.get('photos')
+    fill = not requested and not int(data.get('photos_per_sheet') or 0)
+    if not requested:
+        requested = [{
+            'passport_file': data.get('passport_file'),
+            'size_type': data.get('size_type', '2x2'),
+            'count': data.get('photos_per_sheet') or 1
+        }]
+    
+    photos = {}
+    items = []
+    for entry in requested:
+        passport_file = entry.get('passport_file')
+        if not passport_file:
+            return jsonify({'success': False, 'error': 'Passport file is required'})
+        
+        passport_path = os.path.join(app.config['PASSPORT_FOLDER'], os.path.basename(passport_file))
+        if not os.path.exists(passport_path):
+            return jsonify({'success': False, 'error': f'Passport file not found: {passport_file}'})
+        
+        size_type = entry.get('size_type', '2x2')
+        photo_size_px = PASSPORT_SIZES_PX.get(size_type, (600, 600))
+        key = (os.path.basename(passport_file), photo_size_px)
+        
+        if key not in photos:
+            with Image.open(passport_path) as passport_photo:
+                if passport_photo.size == photo_size_px and passport_photo.format == 'PNG':
+                    with open(passport_path, 'rb') as f:
+                        photos[key] = f.read()
+                else:
+                    buffered = io.BytesIO()
+                    passport_photo.resize(photo_size_px, Image.Resampling.LANCZOS).save(buffered, format='PNG')
+                    photos[key] = buffered.getvalue()
+        
+        # A single photo without photos_per_sheet fills the whole sheet
+        count = 200 if fill else max(1, min(int(entry.get('count') or 1), 200))
+        items.append((key, photo_size_px, count))
+    
+    # Borderless by default - six 2x2 photos exactly fill a 4x6 print
+    paper_px, placements, overflow = layout_photo_sheet(
+        items, paper,
+        margin_in=float(data.get('margin_in', 0)),
+        gap_in=float(data.get('gap_in', 0))
+    )
+    if not placements:
+        return jsonify({'success': False, 'error': f'Photos do not fit on {paper} paper'})
+    
+    file_id = secrets.token_hex(8)
+    if output_format == 'png':
+        sheet_filename = f"{file_id}_sheet_{paper}.png"
+        photo_sheet_png(photos, paper_px, placements).save(
+            os.path.join(app.config['PASSPORT_FOLDER'], sheet_filename), dpi=(SHEET_DPI, SHEET_DPI), format='PNG')
+    else:
+        sheet_filename = f"{file_id}_sheet_{paper}.pdf"
+        with open(os.path.join(app.config['PASSPORT_FOLDER'], sheet_filename), 'wb') as f:
+            f.write(photo_sheet_pdf(photos, paper_px, placements))
+    passport_files_info.append(sheet_filename)
+    
+    response = {
+        'success': True,
+        'sheet_file': sheet_filename,
+        'message': f'Photo sheet with {len(placements)} photos on {paper} paper created successfully!',
+        'photos_count': len(placements),
+        'paper': paper,
+        'orientation': 'landscape' if paper_px[0] > paper_px[1] else 'portrait'
+    }
+    if overflow and not fill:
+        response['not_placed'] = overflow
+    return jsonify(response)
+
 @app.route('/download-passport-file/<filename>')
 def download_passport_file(filename):
     """Download passport photo files"""
@@ -1242,218 +2763,243 @@ def preview_passport_file(filename):
         if os.path.exists(file_path):
             return send_file(file_path)
         else:
-            return jsonify({'success': False, 'error': 'File not found'}), 404
-            
-    except Exception as e:
-        print(f"Passport file preview error: {str(e)}")
-        return jsonify({'success': False, 'error': f'Preview failed: {str(e)}'}), 500
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+            
+    except Exception as e:
+        print(f"Passport file preview error: {str(e)}")
+        return jsonify({'success': False, 'error': f'Preview failed: {str(e)}'}), 500
+
+# ==================== CARD CROPPER FUNCTIONS ====================
+
+# Card layouts as fractions of the PDF page - Aadhaar pattern for all cards.
+# card_width: fraction of page width, aspect: card width / height,
+# gap: space between front & back (fraction of page width).
+# front/back: (left offset, top, width trim, height trim) - left offset and width
+# trim are fractions of page width, top and height trim fractions of page height.
+CARD_CROP_PROFILES = {
+    'aadhaar': {
+        'card_width': 0.42, 'aspect': 1.60, 'gap': 0.010,
+        'front': (0.007, 0.729, 0.01, 0.01),
+        'back': (0.0162, 0.729, 0.01, 0.01)
+    },
+    'jan-aadhaar': {
+        'card_width': 0.42, 'aspect': 1.62, 'gap': 0.010,
+        'front': (0.009, 0.55, 0.01, 0.02),
+        'back': (0.015, 0.55, 0.01, 0.02)
+    },
+    'pan': {
+        'card_width': 0.42, 'aspect': 1.62, 'gap': 0.025,
+        'front': (0.007, 0.79, 0.03, 0.01),
+        'back': (0.05, 0.79, 0.03, 0.01)
+    },
+    'voter': {
+        'card_width': 0.44, 'aspect': 1.67, 'gap': 0.025,
+        'front': (0.007, 0.12, 0.04, 0.01),
+        'back': (0.08, 0.12, 0.05, 0.01)
+    },
+    'ayushman': {
+        'card_width': 0.41, 'aspect': 1.70, 'gap': 0.015,
+        'front': (0.05, 0.32, 0.06, 0.18),
+        'back': (0.05, 0.32, 0.07, 0.18)
+    },
+    'labour': {
+        'card_width': 0.41, 'aspect': 1.05, 'gap': 0.020,
+        'front': (0.007, 0.07, 0.01, 0.02),
+        'back': (0.023, 0.10, 0.02, 0.04)
+    },
+    'default': {
+        'card_width': 0.42, 'aspect': 1.59, 'gap': 0.008,
+        'front': (0.005, 0.729, 0.01, 0.01),
+        'back': (0.013, 0.729, 0.01, 0.01)
+    }
+}
+
+def get_card_crop_rects(card_type, page_rect):
+    """Front & back crop rectangles for a card type in PDF page coordinates (points)"""
+    profile = CARD_CROP_PROFILES.get(card_type, CARD_CROP_PROFILES['default'])
+
+    w, h = page_rect.width, page_rect.height
+    card_width = w * profile['card_width']
+    card_height = card_width / profile['aspect']
+
+    total_cards_width = (card_width * 2) + (w * profile['gap'])
+    start_x = page_rect.x0 + (w - total_cards_width) / 2
+
+    def side_rect(left, side):
+        _, top, width_trim, height_trim = side
+        top = page_rect.y0 + h * top
+        return fitz.Rect(left, top, left + card_width - w * width_trim, top + card_height - h * height_trim)
+
+    # Front Side (Left side) and Back Side (Right side)
+    front_rect = side_rect(start_x + w * profile['front'][0], profile['front'])
+    back_rect = side_rect(start_x + card_width + w * profile['back'][0], profile['back'])
+
+    return front_rect, back_rect
+
+def pixmap_to_image(pix):
+    """Wrap a PyMuPDF pixmap's sample buffer as a PIL image without copying.
+
+    The image shares memory with the pixmap, so pix must stay alive while the
+    image is used - paste or copy it before the pixmap goes out of scope.
+    """
+    modes = {(1, 0): 'L', (2, 1): 'LA', (3, 0): 'RGB', (4, 1): 'RGBA'}
+    mode = modes.get((pix.n, int(pix.alpha)))
+    if mode is None:
+        raise ValueError(f"Unsupported pixmap with {pix.n} channels")
+
+    samples = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+    return Image.frombuffer(mode, (pix.width, pix.height), samples, 'raw', mode, pix.stride, 1)
+
+def render_card_region(page, clip, dpi=300, padding=0):
+    """Rasterize only the clip rectangle of a PDF page at the given DPI.
+
+    The pixmap is pasted straight onto a white canvas (with optional padding),
+    so the only copy made is the final card image itself.
+    """
+    clip = fitz.Rect(clip) & page.rect
+    if clip.is_empty:
+        raise ValueError("Card region lies outside the PDF page")
+
+    matrix = fitz.Matrix(dpi/72, dpi/72)
+    pix = page.get_pixmap(matrix=matrix, clip=clip, alpha=False)
+
+    card = Image.new('RGB', (pix.width + padding*2, pix.height + padding*2), 'white')
+    card.paste(pixmap_to_image(pix), (padding, padding))
+    return card
+
+def extract_native_card_region(doc, page, clip, padding=0):
+    """Crop a card region straight from the embedded raster image that covers it.
+
+    Returns (card_image, effective_dpi) at the image's native resolution, or None
+    when no single unrotated image covers the region or the region also carries
+    text that would be lost without rasterizing the page.
+    """
+    clip = fitz.Rect(clip) & page.rect
+    if clip.is_empty or page.get_text('text', clip=clip).strip():
+        return None
+
+    for img_info in page.get_images(full=True):
+        xref, smask, img_width, img_height = img_info[:4]
+        if smask:
+            continue
+
+        for bbox, transform in page.get_image_rects(xref, transform=True):
+            # Only upright, unflipped placements map 1:1 onto image pixels
+            upright = abs(transform.b) < 1e-6 and abs(transform.c) < 1e-6 and transform.a > 0 and transform.d > 0
+            if not upright or not (bbox + (-1, -1, 1, 1)).contains(clip):
+                continue
+
+            scale_x = img_width / bbox.width
+            scale_y = img_height / bbox.height
+            box = (
+                max(0, int(round((clip.x0 - bbox.x0) * scale_x))),
+                max(0, int(round((clip.y0 - bbox.y0) * scale_y))),
+                min(img_width, int(round((clip.x1 - bbox.x0) * scale_x))),
+                min(img_height, int(round((clip.y1 - bbox.y0) * scale_y)))
+            )
+
+            pix = fitz.Pixmap(doc, xref)
+            if pix.alpha:
+                pix = fitz.Pixmap(pix, 0)
+            if pix.colorspace and pix.colorspace.n not in (1, 3):
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+
+            card = Image.new('RGB', (box[2] - box[0] + padding*2, box[3] - box[1] + padding*2), 'white')
+            card.paste(pixmap_to_image(pix).crop(box), (padding, padding))
+            return card, round(72 * scale_x)
+
+    return None
+
+def crop_card_page(doc, page, card_type='aadhaar', dpi=300, extraction_mode='render', padding=2):
+    """Crop front & back card images from one PDF page.
+
+    extraction_mode 'native' crops from embedded card artwork where possible and
+    falls back to clip rendering; 'render' always rasterizes the clip regions.
+    Returns {'front': (image, dpi, method), 'back': (image, dpi, method)}.
+    """
+    # Card profiles page coordinates mein - sirf front & back clip render honge
+    front_rect, back_rect = get_card_crop_rects(card_type, page.rect)
+
+    print(f"PDF page {page.number + 1} size: {page.rect.width:.1f} x {page.rect.height:.1f} pt")
+    print(f"FRONT Clip (pt): {tuple(round(v, 1) for v in front_rect)}")
+    print(f"BACK Clip (pt): {tuple(round(v, 1) for v in back_rect)}")
+
+    sides = {}
+    for side, rect in (('front', front_rect), ('back', back_rect)):
+        native = None
+        if extraction_mode == 'native':
+            native = extract_native_card_region(doc, page, rect, padding=padding)
+
+        if native:
+            card_img, side_dpi = native
+            sides[side] = (card_img, side_dpi, 'native')
+        else:
+            # Render only the card region instead of the full page
+            sides[side] = (render_card_region(page, rect, dpi, padding=padding), dpi, 'render')
 
-# ==================== CARD CROPPER FUNCTIONS ====================
+    return sides
+
+def open_card_pdf(pdf_path, pdf_password=None):
+    """Open a card PDF, authenticating if needed. Returns (doc, None) or (None, error)"""
+    # PDF open karein
+    doc = fitz.open(pdf_path)
+    
+    # Password check agar PDF protected hai
+    if doc.needs_pass:
+        if pdf_password:
+            if not doc.authenticate(pdf_password):
+                doc.close()
+                return None, "Invalid PDF password"
+        else:
+            doc.close()
+            return None, "PDF is password protected but no password provided."
+    
+    return doc, None
+
+def save_card_sides(sides, output_dir, file_prefix):
+    """Save cropped front & back images as PNG. Returns ({side: filename}, {side: method})"""
+    saved = {}
+    for side, (card_img, side_dpi, method) in sides.items():
+        filename = f"{file_prefix}_{side}.png"
+        card_img.save(os.path.join(output_dir, filename), dpi=(side_dpi, side_dpi), format='PNG', optimize=True)
+        saved[side] = filename
+        print(f"{side.capitalize()} saved: {filename} ({card_img.size[0]}x{card_img.size[1]}, {method} @ {side_dpi:.0f} DPI)")
+    
+    return saved, {side: method for side, (_, _, method) in sides.items()}
 
-def process_pdf_front_back(pdf_path, output_dir, card_type='aadhaar', pdf_password=None):
+def process_pdf_front_back(pdf_path, output_dir, card_type='aadhaar', pdf_password=None, extraction_mode=None, dpi=300):
     """Extract Card Front & Back sides automatically with 300 DPI clarity - TIGHT CROPPING"""
     
-    dpi = 300
+    extraction_mode = extraction_mode or app.config['CARD_EXTRACTION_MODE']
     
     print(f"Processing PDF for Front & Back: {pdf_path}")
-    print(f"Card type: {card_type}")
+    print(f"Card type: {card_type}, extraction mode: {extraction_mode}")
     
     try:
-        # PDF open karein
-        doc = fitz.open(pdf_path)
-        
-        # Password check agar PDF protected hai
-        if doc.needs_pass:
-            if pdf_password:
-                if not doc.authenticate(pdf_password):
-                    doc.close()
-                    return {'success': False, 'error': "Invalid PDF password"}
-            else:
-                doc.close()
-                return {'success': False, 'error': "PDF is password protected but no password provided."}
+        doc, error = open_card_pdf(pdf_path, pdf_password)
+        if error:
+            return {'success': False, 'error': error}
 
         # First page load karein
         page = doc.load_page(0)
         
-        # High quality
-        matrix = fitz.Matrix(dpi/72, dpi/72)
-        pix = page.get_pixmap(matrix=matrix)
-        w, h = pix.width, pix.height
-        
-        print(f"PDF dimensions: {w} x {h}")
-
-        # PERFECT TIGHT CROP COORDINATES FOR ALL CARDS - Aadhaar pattern
-        if card_type == "aadhaar":
-            # Aadhaar card actual dimensions (excluding black border)
-            card_width = int(w * 0.42)
-            card_height = int(card_width / 1.60)
-            
-            total_cards_width = (card_width * 2) + (w * 0.010)
-            start_x = (w - total_cards_width) / 2
-            
-            # Front Side (Left side - Personal details with photo)
-            front_left = int(start_x + w * 0.007)
-            front_top = int(h * 0.729)
-            front_width = card_width - int(w * 0.01)
-            front_height = card_height - int(h * 0.01)
-            
-            # Back Side (Right side - Address and QR Code)
-            back_left = int(start_x + card_width + (w * 0.0162))
-            back_top = int(h * 0.729)
-            back_width = card_width - int(w * 0.01)
-            back_height = card_height - int(h * 0.01)
-
-        elif card_type == "jan-aadhaar":
-            # Jan-Aadhaar - Same pattern as Aadhaar
-            card_width = int(w * 0.42)
-            card_height = int(card_width / 1.62)
-            
-            total_cards_width = (card_width * 2) + (w * 0.010)
-            start_x = (w - total_cards_width) / 2
-            
-            front_left = int(start_x + w * 0.009)
-            front_top = int(h * 0.55)
-            front_width = card_width - int(w * 0.01)
-            front_height = card_height - int(h * 0.02)
-            
-            back_left = int(start_x + card_width + (w * 0.015))
-            back_top = int(h * 0.55)
-            back_width = card_width - int(w * 0.01)
-            back_height = card_height - int(h * 0.02)
-            
-        elif card_type == "pan":
-            # PAN Card - Same pattern as Aadhaar
-            card_width = int(w * 0.42)
-            card_height = int(card_width / 1.62)
-            
-            total_cards_width = (card_width * 2) + (w * 0.025)
-            start_x = (w - total_cards_width) / 2
-            
-            front_left = int(start_x + w * 0.007)
-            front_top = int(h * 0.79)
-            front_width = card_width - int(w * 0.03)
-            front_height = card_height - int(h * 0.01)
-            
-            back_left = int(start_x + card_width + (w * 0.05))
-            back_top = int(h * 0.79)
-            back_width = card_width - int(w * 0.03)
-            back_height = card_height - int(h * 0.01)
-            
-        elif card_type == "voter":
-            # Voter ID - Same pattern as Aadhaar
-            card_width = int(w * 0.44)
-            card_height = int(card_width / 1.67)
-            
-            total_cards_width = (card_width * 2) + (w * 0.025)
-            start_x = (w - total_cards_width) / 2
-            
-            front_left = int(start_x + w * 0.007)
-            front_top = int(h * 0.12)
-            front_width = card_width - int(w * 0.04)
-            front_height = card_height - int(h * 0.01)
-            
-            back_left = int(start_x + card_width + (w * 0.08))
-            back_top = int(h * 0.12)
-            back_width = card_width - int(w * 0.05)
-            back_height = card_height - int(h * 0.01)
-            
-        elif card_type == "ayushman":
-            # Ayushman Card - Same pattern as Aadhaar
-            card_width = int(w * 0.41)
-            card_height = int(card_width / 1.70)
-            
-            total_cards_width = (card_width * 2) + (w * 0.015)
-            start_x = (w - total_cards_width) / 2
-            
-            front_left = int(start_x + w * 0.05)
-            front_top = int(h * 0.32)
-            front_width = card_width - int(w * 0.06)
-            front_height = card_height - int(h * 0.18)
-            
-            back_left = int(start_x + card_width + (w * 0.05))
-            back_top = int(h * 0.32)
-            back_width = card_width - int(w * 0.07)
-            back_height = card_height - int(h * 0.18)
-            
-        elif card_type == "labour":
-            # Labour Card - Same pattern as Aadhaar
-            card_width = int(w * 0.41)
-            card_height = int(card_width / 1.05)
-            
-            total_cards_width = (card_width * 2) + (w * 0.020)
-            start_x = (w - total_cards_width) / 2
-            
-            front_left = int(start_x + w * 0.007)
-            front_top = int(h * 0.07)
-            front_width = card_width - int(w * 0.01)
-            front_height = card_height - int(h * 0.02)
-            
-            back_left = int(start_x + card_width + (w * 0.023))
-            back_top = int(h * 0.10)
-            back_width = card_width - int(w * 0.02)
-            back_height = card_height - int(h * 0.04)
-            
-        else:
-            # Default - Same pattern as Aadhaar for any other card
-            card_width = int(w * 0.42)
-            card_height = int(card_width / 1.59)
-            
-            total_cards_width = (card_width * 2) + (w * 0.008)
-            start_x = (w - total_cards_width) / 2
-            
-            front_left = int(start_x + w * 0.005)
-            front_top = int(h * 0.729)
-            front_width = card_width - int(w * 0.01)
-            front_height = card_height - int(h * 0.01)
-            
-            back_left = int(start_x + card_width + (w * 0.013))
-            back_top = int(h * 0.729)
-            back_width = card_width - int(w * 0.01)
-            back_height = card_height - int(h * 0.01)
-
-        print(f"FRONT Coordinates: left={front_left}, top={front_top}, width={front_width}, height={front_height}")
-        print(f"BACK Coordinates: left={back_left}, top={back_top}, width={back_width}, height={back_height}")
-        print(f"Card Size: {card_width} x {card_height} pixels")
-        print(f"Tight Crop: Only card content (excluding black border)")
-
-        # Process images
-        img_data = pix.tobytes("ppm")
-        img = Image.open(io.BytesIO(img_data))
-        
-        # Crop front and back with TIGHT boundaries
-        front_img = img.crop((front_left, front_top, front_left + front_width, front_top + front_height))
-        back_img = img.crop((back_left, back_top, back_left + back_width, back_top + back_height))
-        
-        # Optional: Add slight padding for better appearance (2px white border)
-        padding = 2
-        front_final = Image.new('RGB', (front_width + padding*2, front_height + padding*2), 'white')
-        front_final.paste(front_img, (padding, padding))
-        
-        back_final = Image.new('RGB', (back_width + padding*2, back_height + padding*2), 'white')
-        back_final.paste(back_img, (padding, padding))
+        # Tight crop with slight padding (2px white border) - only card content, no black border
+        sides = crop_card_page(doc, page, card_type, dpi, extraction_mode, padding=2)
         
         # Save both images
         file_id = str(uuid.uuid4())[:8]
-        front_filename = f"{file_id}_front.png"
-        back_filename = f"{file_id}_back.png"
-        
-        front_path = os.path.join(output_dir, front_filename)
-        back_path = os.path.join(output_dir, back_filename)
+        saved, extraction = save_card_sides(sides, output_dir, file_id)
         
-        front_final.save(front_path, dpi=(dpi, dpi), format='PNG', optimize=True)
-        back_final.save(back_path, dpi=(dpi, dpi), format='PNG', optimize=True)
-        
-        print(f"Front saved: {front_filename} ({front_final.size[0]}x{front_final.size[1]})")
-        print(f"Back saved: {back_filename} ({back_final.size[0]}x{back_final.size[1]})")
         print(f"Crop Result: Black border excluded, only card content captured")
         
         doc.close()
         
         return {
             'success': True,
-            'front_file': front_filename,
-            'back_file': back_filename,
+            'front_file': saved['front'],
+            'back_file': saved['back'],
             'file_id': file_id,
+            'extraction': extraction,
             'message': 'Front & Back sides extracted with tight cropping (no black border)!'
         }
         
@@ -1462,6 +3008,214 @@ def process_pdf_front_back(pdf_path, output_dir, card_type='aadhaar', pdf_passwo
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
         return {'success': False, 'error': str(e)}
+
+# ==================== MULTI-PAGE CARD EXTRACTION ====================
+
+# Pages are rendered in worker processes; each worker opens its own fitz.Document.
+# Also renders PDF uploads to the image converter
+_card_page_pool = None
+_card_page_pool_lock = threading.Lock()
+
+def get_card_page_pool():
+    """Process pool shared by all multi-page PDF requests, created on first use"""
+    global _card_page_pool
+    with _card_page_pool_lock:
+        if _card_page_pool is None:
+            # spawn, not fork: forked children inherit onnxruntime/numba thread state and can hang
+            _card_page_pool = ProcessPoolExecutor(
+                max_workers=app.config['CARD_PAGE_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _card_page_pool
+
+def reset_card_page_pool(pool):
+    """Drop a pool whose worker died (MuPDF crash, OOM kill) so the next request gets a fresh one"""
+    global _card_page_pool
+    with _card_page_pool_lock:
+        if _card_page_pool is pool:
+            _card_page_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def map_card_page_pool(fn, arg_tuples):
+    """Yield fn(*args) for each args tuple in order on the page pool.
+    
+    A dead worker breaks a ProcessPoolExecutor for good, so the pool is rebuilt and the
+    unfinished calls retried once; a second crash is reported as an error.
+    """
+    done = 0
+    for attempt in range(2):
+        pool = get_card_page_pool()
+        futures = []
+        try:
+            futures = [pool.submit(fn, *args) for args in arg_tuples[done:]]
+            for future in futures:
+                result = future.result()
+                done += 1
+                yield result
+            return
+        except BrokenProcessPool as e:
+            reset_card_page_pool(pool)
+            print(f"PDF page worker died ({str(e)}), pool rebuilt")
+            if attempt:
+                raise RuntimeError('PDF rendering crashed - the PDF may be damaged') from e
+        finally:
+            for future in futures:
+                future.cancel()
+
+def _crop_card_pages_worker(pdf_path, pdf_password, page_numbers, output_dir, card_type, dpi, extraction_mode, file_id):
+    """Worker: open the PDF once and crop front & back for a run of pages"""
+    doc, error = open_card_pdf(pdf_path, pdf_password)
+    if error:
+        raise ValueError(error)
+    
+    pairs = []
+    try:
+        for page_number in page_numbers:
+            page = doc.load_page(page_number)
+            sides = crop_card_page(doc, page, card_type, dpi, extraction_mode, padding=2)
+            saved, extraction = save_card_sides(sides, output_dir, f"{file_id}_p{page_number + 1}")
+            pairs.append({
+                'page': page_number + 1,
+                'front_file': saved['front'],
+                'back_file': saved['back'],
+                'extraction': extraction
+            })
+    finally:
+        doc.close()
+    
+    return pairs
+
+def process_pdf_all_pages(pdf_path, output_dir, card_type='aadhaar', pdf_password=None, extraction_mode=None, dpi=300):
+    """Extract Front & Back pairs from EVERY page (family / merged PDFs with one card per page)"""
+    
+    extraction_mode = extraction_mode or app.config['CARD_EXTRACTION_MODE']
+    
+    print(f"Processing ALL pages for Front & Back: {pdf_path}")
+    print(f"Card type: {card_type}, extraction mode: {extraction_mode}")
+    
+    try:
+        doc, error = open_card_pdf(pdf_path, pdf_password)
+        if error:
+            return {'success': False, 'error': error}
+        page_count = doc.page_count
+        doc.close()
+        
+        if page_count == 0:
+            return {'success': False, 'error': "PDF has no pages"}
+        if page_count > app.config['CARD_MAX_PAGES']:
+            return {'success': False, 'error': card_page_limit_error(page_count)}
+        
+        file_id = str(uuid.uuid4())[:8]
+        worker_args = (output_dir, card_type, dpi, extraction_mode, file_id)
+        
+        # One contiguous run of pages per worker keeps document opens to one per worker
+        workers = min(app.config['CARD_PAGE_WORKERS'], page_count)
+        chunk_size = -(-page_count // workers)
+        chunks = [list(range(i, min(i + chunk_size, page_count))) for i in range(0, page_count, chunk_size)]
+        
+        if len(chunks) == 1:
+            pairs = _crop_card_pages_worker(pdf_path, pdf_password, chunks[0], *worker_args)
+        else:
+            # Results come back in submission order, so pages stay in order
+            chunk_pairs = map_card_page_pool(
+                _crop_card_pages_worker, [(pdf_path, pdf_password, chunk, *worker_args) for chunk in chunks]
+            )
+            pairs = [pair for pairs_run in chunk_pairs for pair in pairs_run]
+        
+        print(f"Crop Result: {len(pairs)} card pairs extracted from {page_count} pages using {len(chunks)} worker(s)")
+        
+        return {
+            'success': True,
+            'front_file': pairs[0]['front_file'],
+            'back_file': pairs[0]['back_file'],
+            'file_id': file_id,
+            'extraction': pairs[0]['extraction'],
+            'pages': pairs,
+            'page_count': page_count,
+            'message': f'Front & Back sides extracted from {page_count} pages with tight cropping!'
+        }
+        
+    except Exception as e:
+        print(f"Error in process_pdf_all_pages: {str(e)}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+        return {'success': False, 'error': str(e)}
+
+def card_result_files(result):
+    """All artifact filenames produced by a card crop result"""
+    pages = result.get('pages') or [result]
+    return [name for pair in pages for name in (pair['front_file'], pair['back_file'])]
+
+def card_cache_key(pdf_bytes, card_type='aadhaar', pdf_password='', extraction_mode=None, dpi=300, all_pages=False):
+    """Content-addressed key: same PDF + same settings + same password = same artifacts"""
+    return '|'.join([
+        hashlib.sha256(pdf_bytes).hexdigest(), card_type, str(dpi),
+        extraction_mode or app.config['CARD_EXTRACTION_MODE'], 'all' if all_pages else 'first',
+        password_fingerprint(pdf_password)
+    ])
+
+# A hit must leave the client time to download before the cleaner removes the files
+CARD_CACHE_MIN_REMAINING_SECONDS = 90
+
+def cached_card_crop(cache_key):
+    """Cached crop result whose artifacts are still on disk, refreshed so the cleaner keeps them - or None"""
+    start_time = time.time()
+    cached = card_result_cache.get(cache_key)
+    if not cached:
+        return None
+    
+    paths = [os.path.join(app.config['CROPPED_FOLDER'], name) for name in card_result_files(cached)]
+    try:
+        # The cleaner ages files by ctime; skip artifacts about to be deleted
+        oldest = min(os.path.getctime(path) for path in paths)
+        if time.time() - oldest > file_cleaner.retention_minutes * 60 - CARD_CACHE_MIN_REMAINING_SECONDS:
+            raise FileNotFoundError('artifacts near retention')
+        for path in paths:
+            os.utime(path)
+    except OSError:
+        # Artifacts cleaned up or about to be - recompute
+        card_result_cache.discard(cache_key)
+        return None
+    
+    print(f"Card crop cache HIT in {(time.time() - start_time) * 1000:.1f} ms")
+    return dict(cached, cached=True)
+
+def crop_uploaded_card(pdf_bytes, card_type='aadhaar', pdf_password='', extraction_mode=None, dpi=300, all_pages=False,
+                       cache_key=None):
+    """Crop an uploaded card PDF, serving repeat uploads of the same PDF from the result cache.
+    
+    Pass cache_key when the caller already checked the cache (e.g. in the request thread).
+    """
+    extraction_mode = extraction_mode or app.config['CARD_EXTRACTION_MODE']
+    
+    if cache_key is None:
+        cache_key = card_cache_key(pdf_bytes, card_type, pdf_password, extraction_mode, dpi, all_pages)
+        cached = cached_card_crop(cache_key)
+        if cached:
+            return cached
+    
+    file_id = secrets.token_hex(8)
+    pdf_filename = f"{file_id}.pdf"
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
+    with open(pdf_path, 'wb') as f:
+        f.write(pdf_bytes)
+    
+    processor = process_pdf_all_pages if all_pages else process_pdf_front_back
+    result = processor(
+        pdf_path=pdf_path,
+        output_dir=app.config['CROPPED_FOLDER'],
+        card_type=card_type,
+        pdf_password=pdf_password,
+        extraction_mode=extraction_mode,
+        dpi=dpi
+    )
+    
+    # Only successful crops are cached - a wrong password must be retried for real
+    if result['success']:
+        card_result_cache.set(cache_key, result)
+    
+    return dict(result, cached=False)
+
 # ==================== STATIC SITEMAP & ROBOTS ROUTES ====================
 
 @app.route('/sitemap.xml')
@@ -1713,8 +3467,6 @@ def faq():
 @app.route('/upload-card-both', methods=['POST'])
 def upload_card_both():
     """Main endpoint for ALL card types front-back cropping"""
-    global cropped_files_info
-    
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'No file selected'})
@@ -1728,50 +3480,88 @@ def upload_card_both():
         
         card_type = request.form.get('card_type', 'aadhaar')
         password = request.form.get('password', '')
+        extraction_mode = request.form.get('extraction_mode')
+        all_pages = request.form.get('all_pages', 'false') == 'true'
         
-        file_id = secrets.token_hex(8)
-        pdf_filename = f"{file_id}.pdf"
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
-        file.save(pdf_path)
+        card_names = {
+            'aadhaar': 'Aadhaar',
+            'pan': 'PAN', 
+            'voter': 'Voter ID',
+            'jan-aadhaar': 'Jan-Aadhaar',
+            'ayushman': 'Ayushman Card',
+            'labour': 'Labour Card'
+        }
+        
+        card_name = card_names.get(card_type, 'Card')
         
         print(f"Auto cropping {card_type.upper()} Front & Back")
         
-        # Use the auto front-back cropper for ALL card types
-        result = process_pdf_front_back(
-            pdf_path=pdf_path,
-            output_dir=app.config['CROPPED_FOLDER'],
+        # Use the auto front-back cropper for ALL card types, run as a job (?async=true returns a job ID)
+        return run_card_crop(file.read(), card_type, password, extraction_mode, all_pages, card_name)
+        
+    except Exception as e:
+        print(f"Auto crop error: {str(e)}")
+        return jsonify({'success': False, 'error': f'Processing failed: {str(e)}'})
+
+def card_crop_response(result, card_type, card_name):
+    """Route response for a crop_uploaded_card result"""
+    if not result['success']:
+        return {'success': False, 'error': result['error']}
+    
+    cropped_files_info.extend(card_result_files(result))
+    return {
+        'success': True,
+        'message': f'{card_name} Front & Back cropped successfully!',
+        'file_id': result['file_id'],
+        'front_file': result['front_file'],
+        'back_file': result['back_file'],
+        'card_type': card_type,
+        'cached': result['cached'],
+        'pages': result.get('pages')
+    }
+
+def card_page_limit_error(page_count):
+    return f"Too many pages ({page_count}), maximum is {app.config['CARD_MAX_PAGES']} for all-pages extraction"
+
+def count_pdf_pages(pdf_bytes):
+    """Page count of an uploaded PDF (readable without the password), or None if it does not open"""
+    try:
+        with fitz.open(stream=pdf_bytes, filetype='pdf') as doc:
+            return doc.page_count
+    except Exception:
+        return None
+
+def run_card_crop(pdf_bytes, card_type, password, extraction_mode, all_pages, card_name):
+    """Serve repeat uploads from the cache in the request thread; only misses queue as a card_crop job"""
+    if all_pages:
+        # Oversized PDFs are refused before any job or page worker is started
+        page_count = count_pdf_pages(pdf_bytes)
+        if page_count is not None and page_count > app.config['CARD_MAX_PAGES']:
+            return jsonify({'success': False, 'error': card_page_limit_error(page_count)})
+    
+    cache_key = card_cache_key(pdf_bytes, card_type, password, extraction_mode, all_pages=all_pages)
+    cached = cached_card_crop(cache_key)
+    if cached:
+        return finished_job_response('card_crop', card_crop_response(cached, card_type, card_name))
+    return run_job('card_crop', card_crop_job, pdf_bytes, card_type, password, extraction_mode, all_pages, card_name,
+                   cache_key)
+
+def card_crop_job(pdf_bytes, card_type, password, extraction_mode, all_pages, card_name, cache_key=None):
+    """Front-back crop of an uploaded card PDF - job body for the card upload routes"""
+    try:
+        result = crop_uploaded_card(
+            pdf_bytes,
             card_type=card_type,
-            pdf_password=password
+            pdf_password=password,
+            extraction_mode=extraction_mode,
+            all_pages=all_pages,
+            cache_key=cache_key
         )
-        
-        if result['success']:
-            cropped_files_info.extend([result['front_file'], result['back_file']])
-            
-            card_names = {
-                'aadhaar': 'Aadhaar',
-                'pan': 'PAN', 
-                'voter': 'Voter ID',
-                'jan-aadhaar': 'Jan-Aadhaar',
-                'ayushman': 'Ayushman Card',
-                'labour': 'Labour Card'
-            }
-            
-            card_name = card_names.get(card_type, 'Card')
-            
-            return jsonify({
-                'success': True,
-                'message': f'{card_name} Front & Back cropped successfully!',
-                'file_id': result['file_id'],
-                'front_file': result['front_file'],
-                'back_file': result['back_file'],
-                'card_type': card_type
-            })
-        else:
-            return jsonify({'success': False, 'error': result['error']})
+        return card_crop_response(result, card_type, card_name)
         
     except Exception as e:
         print(f"Auto crop error: {str(e)}")
-        return jsonify({'success': False, 'error': f'Processing failed: {str(e)}'})
+        return {'success': False, 'error': f'Processing failed: {str(e)}'}
 
 # ==================== BACKWARD COMPATIBILITY ROUTES ====================
 
@@ -1805,35 +3595,13 @@ def upload_voterid_both():
             return jsonify({'success': False, 'error': 'Please upload a PDF file'})
         
         password = request.form.get('password', '')
-        
-        file_id = secrets.token_hex(8)
-        pdf_filename = f"{file_id}.pdf"
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
-        file.save(pdf_path)
+        extraction_mode = request.form.get('extraction_mode')
+        all_pages = request.form.get('all_pages', 'false') == 'true'
         
         print(f"Auto cropping VOTER ID Front & Back")
         
-        # Use the auto front-back cropper for Voter ID
-        result = process_pdf_front_back(
-            pdf_path=pdf_path,
-            output_dir=app.config['CROPPED_FOLDER'],
-            card_type='voter',
-            pdf_password=password
-        )
-        
-        if result['success']:
-            cropped_files_info.extend([result['front_file'], result['back_file']])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Voter ID Card Front & Back cropped successfully!',
-                'file_id': result['file_id'],
-                'front_file': result['front_file'],
-                'back_file': result['back_file'],
-                'card_type': 'voter'
-            })
-        else:
-            return jsonify({'success': False, 'error': result['error']})
+        # Use the auto front-back cropper for Voter ID Card, run as a job (?async=true returns a job ID)
+        return run_card_crop(file.read(), 'voter', password, extraction_mode, all_pages, 'Voter ID Card')
         
     except Exception as e:
         print(f"Voter ID crop error: {str(e)}")
@@ -1859,35 +3627,13 @@ def upload_labour_both():
             return jsonify({'success': False, 'error': 'Please upload a PDF file'})
         
         password = request.form.get('password', '')
-        
-        file_id = secrets.token_hex(8)
-        pdf_filename = f"{file_id}.pdf"
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
-        file.save(pdf_path)
+        extraction_mode = request.form.get('extraction_mode')
+        all_pages = request.form.get('all_pages', 'false') == 'true'
         
         print(f"Auto cropping LABOUR CARD Front & Back")
         
-        # Use the auto front-back cropper for Labour Card
-        result = process_pdf_front_back(
-            pdf_path=pdf_path,
-            output_dir=app.config['CROPPED_FOLDER'],
-            card_type='labour',
-            pdf_password=password
-        )
-        
-        if result['success']:
-            cropped_files_info.extend([result['front_file'], result['back_file']])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Labour Card Front & Back cropped successfully!',
-                'file_id': result['file_id'],
-                'front_file': result['front_file'],
-                'back_file': result['back_file'],
-                'card_type': 'labour'
-            })
-        else:
-            return jsonify({'success': False, 'error': result['error']})
+        # Use the auto front-back cropper for Labour Card, run as a job (?async=true returns a job ID)
+        return run_card_crop(file.read(), 'labour', password, extraction_mode, all_pages, 'Labour Card')
         
     except Exception as e:
         print(f"Labour Card crop error: {str(e)}")
@@ -2464,64 +4210,129 @@ def convert_image():
         if output_format not in supported_formats:
             return jsonify({'success': False, 'error': f'Format {output_format.upper()} not supported. Use: {", ".join(supported_formats.keys())}'})
         
-        # Generate unique filename
         file_id = secrets.token_hex(8)
-        original_filename = file.filename
-        file_extension = original_filename.rsplit('.', 1)[-1].lower()
-        
-        # Save uploaded file temporarily
-        temp_filename = f"{file_id}_temp.{file_extension}"
-        temp_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-        file.save(temp_path)
-        
-        # Process image conversion
-        with Image.open(temp_path) as img:
-            # Convert to RGB if necessary (for JPG/PDF)
-            if output_format in ['jpg', 'jpeg', 'pdf'] and img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            
-            output_filename = f"{file_id}_converted.{output_format}"
-            output_path = os.path.join(app.config['CONVERTED_FOLDER'], output_filename)
-            
-            # Save with format-specific options
-            save_options = {
-                'format': supported_formats[output_format],
-                'optimize': True
-            }
-            
-            # Add quality for lossy formats
-            if output_format in ['jpg', 'jpeg', 'webp']:
-                save_options['quality'] = quality
-            elif output_format == 'png':
-                save_options['compress_level'] = 9 - int((quality / 100) * 9)
-            
-            # Special handling for PDF
-            if output_format == 'pdf':
-                img.save(output_path, "PDF", resolution=100.0)
-            else:
-                img.save(output_path, **save_options)
-            
-            converted_files_info.append(output_filename)
-            
-            # Get file size for response
-            file_size = os.path.getsize(output_path)
-            
-            # Return JSON response with file info for frontend
-            return jsonify({
-                'success': True,
-                'message': f'Image converted to {output_format.upper()} successfully!',
-                'converted_file': output_filename,
-                'format': output_format,
-                'file_id': file_id,
-                'file_size': file_size,
-                'file_size_kb': round(file_size / 1024, 2),
-                'file_size_mb': round(file_size / (1024 * 1024), 2)
-            })
+        
+        # Optional longest side in px - large photos are then decoded at reduced scale
+        max_size = int(request.form.get('max_size') or 0)
+        # Optional size limit ("under 20 KB" portals) - quality and, if needed, dimensions are picked to fit
+        target_kb, error = parse_target_kb(request.form.get('target_kb'))
+        if error:
+            return jsonify({'success': False, 'error': error})
+        
+        image_bytes = file.read()
+        if is_pdf_upload(file.filename, image_bytes):
+            return convert_pdf_upload(file_id, file.filename, image_bytes, output_format, supported_formats, quality,
+                                      max_size, target_kb)
+        
+        # Decoded straight from the request body and encoded into memory - no temp upload on disk.
+        # Identical input + options are served from conversion_cache
+        converted_bytes, info = convert_bytes_cached(image_bytes, output_format, supported_formats, quality, max_size,
+                                                     target_kb, parallel=app.config['CONVERT_PER_REQUEST'])
+        file_size = len(converted_bytes)
+        
+        fields = {
+            **info,
+            'format': output_format,
+            'file_id': file_id,
+            'file_size': file_size,
+            'file_size_kb': round(file_size / 1024, 2),
+            'file_size_mb': round(file_size / (1024 * 1024), 2)
+        }
+        output_filename = f"{file_id}_converted.{output_format}"
+        
+        # response=binary returns the file itself, response=json a base64 data URL;
+        # only the default 'artifact' mode writes to disk for a later /download-converted
+        response_mode = (request.form.get('response') or request.args.get('response') or 'artifact').lower()
+        mimetype = mimetypes.guess_type(output_filename)[0] or 'application/octet-stream'
+        
+        if response_mode == 'binary':
+            download_name = f"{file.filename.rsplit('.', 1)[0]}.{output_format}"
+            response = send_file(io.BytesIO(converted_bytes), mimetype=mimetype, as_attachment=True, download_name=download_name)
+            for key, value in fields.items():
+                if value is not None:
+                    response.headers['X-' + key.replace('_', '-').title()] = str(value)
+            return response
+        
+        if response_mode == 'json':
+            data_url = f"data:{mimetype};base64,{base64.b64encode(converted_bytes).decode('utf-8')}"
+            return jsonify(dict(
+                fields,
+                success=True,
+                message=f'Image converted to {output_format.upper()} successfully!',
+                data=data_url
+            ))
+        
+        with open(os.path.join(app.config['CONVERTED_FOLDER'], output_filename), 'wb') as f:
+            f.write(converted_bytes)
+        converted_files_info.append(output_filename)
+        
+        # Return JSON response with file info for frontend
+        return jsonify(dict(
+            fields,
+            success=True,
+            message=f'Image converted to {output_format.upper()} successfully!',
+            converted_file=output_filename
+        ))
             
     except Exception as e:
         print(f"Image conversion error: {str(e)}")
         return jsonify({'success': False, 'error': f'Conversion failed: {str(e)}'})
 
+def convert_pdf_upload(file_id, original_filename, pdf_bytes, output_format, supported_formats, quality, max_size=0, target_kb=0):
+    """/convert-image for PDFs: one image per selected page - saved, inline (response=json/binary) or a streamed ZIP"""
+    pages = rasterize_pdf(
+        pdf_bytes, output_format, supported_formats, quality,
+        pdf_password=request.form.get('pdf_password', ''),
+        page_spec=request.form.get('pages'),
+        dpi=request.form.get('dpi'),
+        max_size=max_size,
+        target_kb=target_kb
+    )
+    stem = original_filename.rsplit('.', 1)[0]
+    zip_headers = {'Content-Disposition': f'attachment; filename={stem}_{output_format}.zip'}
+    response_mode = (request.form.get('response') or request.args.get('response') or 'artifact').lower()
+    mimetype = mimetypes.guess_type(f'page.{output_format}')[0] or 'application/octet-stream'
+    
+    if request.args.get('stream') == 'true' or request.form.get('stream') == 'true':
+        # First page rendered here so a bad password or page range still gets a JSON error
+        first_page = next(pages)
+        entries = ((f"{stem}_p{page['page']}.{output_format}", page['data']) for page in chain([first_page], pages))
+        return Response(stream_with_context(stream_zip(entries, zip_compression(output_format))),
+                        mimetype='application/zip', headers=zip_headers)
+    
+    pages = list(pages)
+    if response_mode == 'binary':
+        if len(pages) == 1:
+            return send_file(io.BytesIO(pages[0]['data']), mimetype=mimetype, as_attachment=True,
+                             download_name=f"{stem}_p{pages[0]['page']}.{output_format}")
+        entries = [(f"{stem}_p{page['page']}.{output_format}", page['data']) for page in pages]
+        return Response(stream_zip(entries, zip_compression(output_format)), mimetype='application/zip', headers=zip_headers)
+    
+    results = []
+    for page in pages:
+        data = page.pop('data')
+        info = dict(page, file_size=len(data), file_size_kb=round(len(data) / 1024, 2))
+        if response_mode == 'json':
+            info['data'] = f"data:{mimetype};base64,{base64.b64encode(data).decode('utf-8')}"
+        else:
+            output_filename = pdf_page_name(file_id, original_filename, page['page'], output_format)
+            with open(os.path.join(app.config['CONVERTED_FOLDER'], output_filename), 'wb') as f:
+                f.write(data)
+            converted_files_info.append(output_filename)
+            info['converted_file'] = output_filename
+        results.append(info)
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(results)} PDF page(s) converted to {output_format.upper()} successfully!',
+        'format': output_format,
+        'file_id': file_id,
+        'converted_file': results[0].get('converted_file'),
+        'file_size_kb': results[0]['file_size_kb'],
+        'page_count': len(results),
+        'pages': results
+    })
+
 @app.route('/download-converted/<filename>')
 def download_converted(filename):
     """Download converted image files"""
@@ -2576,9 +4387,13 @@ def bulk_convert():
         if output_format not in supported_formats:
             return jsonify({'success': False, 'error': f'Format {output_format.upper()} not supported'})
         
-        converted_files = []
-        total_size = 0
+        # Optional size limit per file in KB - checked before anything is written
+        target_kb, error = parse_target_kb(request.form.get('target_kb'))
+        if error:
+            return jsonify({'success': False, 'error': error})
         
+        # Save uploads here - the request streams are gone once the job runs
+        saved_files = []
         for file in files:
             if file.filename:
                 file_id = secrets.token_hex(8)
@@ -2589,77 +4404,423 @@ def bulk_convert():
                 temp_filename = f"{file_id}_temp.{file_extension}"
                 temp_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
                 file.save(temp_path)
-                
-                # Convert image
-                with Image.open(temp_path) as img:
-                    if output_format in ['jpg', 'jpeg', 'pdf'] and img.mode in ('RGBA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    output_filename = f"{file_id}_{original_filename.rsplit('.', 1)[0]}.{output_format}"
-                    output_path = os.path.join(app.config['CONVERTED_FOLDER'], output_filename)
-                    
-                    # Save with format-specific options
-                    save_options = {
-                        'format': supported_formats[output_format],
-                        'optimize': True
-                    }
-                    
-                    if output_format in ['jpg', 'jpeg', 'webp']:
-                        save_options['quality'] = quality
-                    elif output_format == 'png':
-                        save_options['compress_level'] = 9 - int((quality / 100) * 9)
-                    
-                    if output_format == 'pdf':
-                        img.save(output_path, "PDF", resolution=100.0)
-                    else:
-                        img.save(output_path, **save_options)
-                    
-                    file_size = os.path.getsize(output_path)
-                    total_size += file_size
-                    
-                    converted_files.append({
-                        'filename': output_filename,
-                        'original_name': original_filename,
-                        'size': file_size,
-                        'size_kb': round(file_size / 1024, 2),
-                        'size_mb': round(file_size / (1024 * 1024), 2)
-                    })
-                    converted_files_info.append(output_filename)
+                saved_files.append((file_id, original_filename, temp_path))
+        
+        # Optional longest side in px for every output (size limit per file in KB parsed above)
+        max_size = int(request.form.get('max_size') or 0)
+        # PDF uploads: pages ('1-3,5', all by default), render DPI and password
+        pdf_options = {
+            'page_spec': request.form.get('pages'),
+            'dpi': request.form.get('dpi'),
+            'pdf_password': request.form.get('pdf_password', '')
+        }
+        
+        # stream=true: ZIP goes straight into the response as files finish, nothing stored for a second download
+        if request.args.get('stream') == 'true' or request.form.get('stream') == 'true':
+            return Response(
+                stream_with_context(stream_bulk_zip(saved_files, output_format, supported_formats, quality, max_size, target_kb, pdf_options)),
+                mimetype='application/zip',
+                headers={'Content-Disposition': f'attachment; filename=bulk_converted_{output_format}.zip'}
+            )
+        
+        return run_job('bulk_convert', bulk_convert_job, saved_files, output_format, supported_formats, quality, max_size, target_kb, pdf_options)
+        
+    except Exception as e:
+        print(f"Bulk conversion error: {str(e)}")
+        return jsonify({'success': False, 'error': f'Bulk conversion failed: {str(e)}'})
+
+# Already compressed outputs go into ZIPs as-is - deflating them burns CPU for ~0% gain
+STORED_ZIP_FORMATS = {'jpg', 'jpeg', 'webp', 'png'}
+
+def zip_compression(output_format):
+    return zipfile.ZIP_STORED if output_format in STORED_ZIP_FORMATS else zipfile.ZIP_DEFLATED
+
+def fit_for_format(img, output_format, max_size=0):
+    """Shrink to max_size and drop modes the output format can't store"""
+    if max_size and max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    
+    if output_format in ['jpg', 'jpeg', 'pdf'] and img.mode in ('RGBA', 'P'):
+        img = img.convert('RGB')
+    return img
+
+def save_converted(img, output, output_format, supported_formats, quality, pdf_quality=None):
+    """Save with format-specific options to a path or file object"""
+    save_options = {
+        'format': supported_formats[output_format],
+        'optimize': True
+    }
+    
+    if output_format in ['jpg', 'jpeg', 'webp']:
+        save_options['quality'] = quality
+    elif output_format == 'png':
+        save_options['compress_level'] = 9 - int((quality / 100) * 9)
+    
+    if output_format == 'pdf':
+        # The PDF writer embeds RGB pages as JPEG; quality only set for target-size encodes
+        img.save(output, "PDF", resolution=100.0, **({'quality': pdf_quality} if pdf_quality else {}))
+    else:
+        img.save(output, **save_options)
+
+def encode_converted(source, output, output_format, supported_formats, quality, max_size=0):
+    """Open an upload (path, bytes or stream), resize/convert it and save it to output (path or file object)"""
+    with open_image(source, target_size=(max_size, max_size) if max_size else None) as img:
+        img = fit_for_format(img, output_format, max_size)
+        save_converted(img, output, output_format, supported_formats, quality)
+
+# Formats whose size a quality setting controls; others can only shrink in pixels for target_kb
+TARGET_QUALITY_FORMATS = {'jpg', 'jpeg', 'webp', 'pdf'}
+
+def encode_image_to_target(img, output_format, supported_formats, target_bytes, parallel=1):
+    """Largest-quality encode of img under target_bytes - quality search first, then downscaling.
+    
+    Quality is searched in [TARGET_MIN_QUALITY, 95] evaluating `parallel` candidates per round on the
+    convert pool (plain bisection when 1). When even the minimum quality is too big, the image is shrunk
+    by the estimated ratio and searched again. Returns (bytes, info).
+    """
+    min_quality = app.config['TARGET_MIN_QUALITY']
+    lossy = output_format in TARGET_QUALITY_FORMATS
+    
+    def encode(img, quality):
+        output = io.BytesIO()
+        # Saves stash options on the image, so concurrent encodes each get a copy
+        save_converted(img.copy() if parallel > 1 else img, output, output_format, supported_formats,
+                       quality, pdf_quality=quality if output_format == 'pdf' else None)
+        return output.getvalue()
+    
+    def search(img):
+        """(quality, bytes) of the best fit, or (None, smallest bytes) if nothing fits"""
+        if not lossy:
+            # quality 0 = PNG compress_level 9, ignored elsewhere
+            data = encode(img, 0)
+            return (0 if len(data) <= target_bytes else None), data
+        
+        low, high = min_quality, 95
+        best = None
+        smallest = None
+        while low <= high:
+            count = min(parallel, high - low + 1)
+            candidates = sorted({low + (high - low) * (i + 1) // (count + 1) for i in range(count)})
+            if parallel > 1:
+                results = map_bounded(lambda q: encode(img, q), candidates, parallel)
+            else:
+                results = [encode(img, q) for q in candidates]
+            
+            for quality, data in zip(candidates, results):
+                if isinstance(data, Exception):
+                    raise data
+                if len(data) <= target_bytes:
+                    if best is None or quality > best[0]:
+                        best = (quality, data)
+                    low = max(low, quality + 1)
+                else:
+                    if smallest is None or len(data) < len(smallest):
+                        smallest = data
+                    high = min(high, quality - 1)
+        
+        if best:
+            return best
+        return None, smallest if smallest is not None else encode(img, min_quality)
+    
+    scaled = img
+    for _ in range(8):
+        quality, data = search(scaled)
+        if quality is not None or min(scaled.size) <= 16:
+            break
+        # Bytes scale roughly with pixel count; aim a little under the target
+        ratio = (target_bytes / len(data)) ** 0.5 * 0.95
+        size = (max(1, int(scaled.width * ratio)), max(1, int(scaled.height * ratio)))
+        scaled = img.resize(size, Image.Resampling.LANCZOS)
+    
+    return data, {
+        'quality': quality if lossy else None,
+        'width': scaled.width,
+        'height': scaled.height,
+        'target_met': quality is not None
+    }
+
+def encode_to_target(source, output_format, supported_formats, target_bytes, max_size=0, parallel=1):
+    """Open an upload and encode it under target_bytes. Returns (bytes, info)"""
+    with open_image(source, target_size=(max_size, max_size) if max_size else None) as img:
+        img = fit_for_format(img, output_format, max_size)
+        img.load()
+        return encode_image_to_target(img, output_format, supported_formats, target_bytes, parallel)
+
+# ==================== PDF INPUT ====================
+
+def is_pdf_upload(filename, data):
+    return (filename or '').lower().endswith('.pdf') or data[:5] == b'%PDF-'
+
+def open_pdf_input(pdf_bytes, pdf_password=''):
+    """Open an uploaded PDF from memory, authenticating if needed - ValueError when it can't be read"""
+    doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+    if doc.needs_pass and not doc.authenticate(pdf_password or ''):
+        doc.close()
+        raise ValueError('Invalid PDF password' if pdf_password else 'PDF is password protected but no password provided.')
+    return doc
+
+def parse_page_selection(spec, page_count):
+    """0-based page numbers from '1-3,5' style input (all pages when empty), capped at PDF_MAX_PAGES"""
+    if not spec or str(spec).strip().lower() == 'all':
+        pages = list(range(page_count))
+    else:
+        pages = []
+        for part in str(spec).split(','):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition('-')
+            first = int(first)
+            last = int(last) if last else first
+            if first < 1 or last > page_count or first > last:
+                raise ValueError(f'Invalid page range {part} - the PDF has {page_count} pages')
+            pages.extend(range(first - 1, last))
+        pages = list(dict.fromkeys(pages))
+    
+    if not pages:
+        raise ValueError('No pages selected')
+    if len(pages) > app.config['PDF_MAX_PAGES']:
+        raise ValueError(f"Too many pages ({len(pages)}), maximum is {app.config['PDF_MAX_PAGES']} per conversion")
+    return pages
+
+def _rasterize_pdf_pages_worker(pdf_bytes, pdf_password, page_numbers, dpi, output_format, supported_formats, quality, max_size, target_bytes):
+    """Worker: open the PDF once, render a run of pages at dpi and encode each in the output format"""
+    doc = open_pdf_input(pdf_bytes, pdf_password)
+    zoom = dpi / 72
+    pages = []
+    try:
+        for page_number in page_numbers:
+            page = doc.load_page(page_number)
+            pixels = page.rect.width * zoom * page.rect.height * zoom
+            if pixels > app.config['IMAGE_MAX_PIXELS']:
+                raise ValueError(f'Page {page_number + 1} is too large at {dpi} DPI - use a lower dpi')
+            
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            img = fit_for_format(pixmap_to_image(pix), output_format, max_size)
+            if target_bytes:
+                data, info = encode_image_to_target(img, output_format, supported_formats, target_bytes)
+            else:
+                output = io.BytesIO()
+                save_converted(img, output, output_format, supported_formats, quality)
+                data, info = output.getvalue(), {}
+            pages.append(dict(info, page=page_number + 1, data=data))
+    finally:
+        doc.close()
+    return pages
+
+def rasterize_pdf(pdf_bytes, output_format, supported_formats, quality, pdf_password='', page_spec=None, dpi=None,
+                  max_size=0, target_kb=0):
+    """Yield converted pages ({'page', 'data', ...}) in order, rendered across the PDF page process pool"""
+    dpi = max(36, min(600, int(dpi or app.config['PDF_INPUT_DPI'])))
+    doc = open_pdf_input(pdf_bytes, pdf_password)
+    try:
+        page_numbers = parse_page_selection(page_spec, doc.page_count)
+    finally:
+        doc.close()
+    
+    worker_args = (dpi, output_format, supported_formats, quality, max_size, int(target_kb * 1024))
+    workers = min(app.config['CARD_PAGE_WORKERS'], len(page_numbers))
+    if workers <= 1:
+        yield from _rasterize_pdf_pages_worker(pdf_bytes, pdf_password, page_numbers, *worker_args)
+        return
+    
+    # Several short runs per worker so the first pages come back early for streamed ZIPs
+    chunk_size = max(1, -(-len(page_numbers) // (workers * 2)))
+    chunks = [page_numbers[i:i + chunk_size] for i in range(0, len(page_numbers), chunk_size)]
+    for pages in map_card_page_pool(_rasterize_pdf_pages_worker,
+                                    [(pdf_bytes, pdf_password, chunk, *worker_args) for chunk in chunks]):
+        yield from pages
+
+def pdf_page_name(file_id, original_filename, page, output_format):
+    return f"{file_id}_{original_filename.rsplit('.', 1)[0]}_p{page}.{output_format}"
+
+def parse_target_kb(value):
+    """target_kb form value -> (KB or 0 when not requested, error message or None)"""
+    if value in (None, ''):
+        return 0, None
+    try:
+        target_kb = float(value)
+    except ValueError:
+        return 0, 'target_kb must be a positive number of kilobytes'
+    if not 0 < target_kb < float('inf'):
+        return 0, 'target_kb must be a positive number of kilobytes'
+    return target_kb, None
+
+def convert_bytes_cached(image_bytes, output_format, supported_formats, quality, max_size=0, target_kb=0, parallel=1):
+    """Converted bytes for an upload plus info (cached flag, target_kb results) - served from conversion_cache when seen"""
+    cache_key = hashlib.sha256(image_bytes + f'|{output_format}|{quality}|{max_size}|{target_kb}'.encode()).hexdigest()
+    cached = conversion_cache.get(cache_key)
+    if cached is not None:
+        return cached[0], dict(cached[1], cached=True)
+    
+    if target_kb:
+        converted_bytes, info = encode_to_target(image_bytes, output_format, supported_formats,
+                                                 int(target_kb * 1024), max_size, parallel)
+    else:
+        output = io.BytesIO()
+        encode_converted(image_bytes, output, output_format, supported_formats, quality, max_size)
+        converted_bytes, info = output.getvalue(), {}
+    
+    if len(converted_bytes) <= CONVERSION_CACHE_MAX_BYTES:
+        conversion_cache.set(cache_key, (converted_bytes, info))
+    return converted_bytes, dict(info, cached=False)
+
+def converted_name(file_id, original_filename, output_format):
+    return f"{file_id}_{original_filename.rsplit('.', 1)[0]}.{output_format}"
+
+def converted_file_info(filename, original_name, data, info=None):
+    file_size = len(data)
+    return dict(
+        info or {},
+        filename=filename,
+        original_name=original_name,
+        size=file_size,
+        size_kb=round(file_size / 1024, 2),
+        size_mb=round(file_size / (1024 * 1024), 2)
+    )
+
+def convert_saved_entries(saved_file, output_format, supported_formats, quality, max_size=0, target_kb=0, pdf_options=None):
+    """(output name, bytes, info) for one saved upload - one entry per selected page for PDFs"""
+    file_id, original_filename, temp_path = saved_file
+    with open(temp_path, 'rb') as f:
+        data = f.read()
+    
+    if is_pdf_upload(original_filename, data):
+        pdf_options = pdf_options or {}
+        return [
+            (pdf_page_name(file_id, original_filename, page.pop('page'), output_format), page.pop('data'), page)
+            for page in rasterize_pdf(data, output_format, supported_formats, quality, max_size=max_size,
+                                      target_kb=target_kb, **pdf_options)
+        ]
+    
+    converted_bytes, info = convert_bytes_cached(data, output_format, supported_formats, quality, max_size, target_kb)
+    return [(converted_name(file_id, original_filename, output_format), converted_bytes, info)]
+
+def convert_saved_file(saved_file, output_format, supported_formats, quality, max_size=0, target_kb=0, pdf_options=None):
+    """Convert one saved upload into CONVERTED_FOLDER and return the info of each output file"""
+    converted = []
+    for output_filename, data, info in convert_saved_entries(saved_file, output_format, supported_formats, quality,
+                                                             max_size, target_kb, pdf_options):
+        with open(os.path.join(app.config['CONVERTED_FOLDER'], output_filename), 'wb') as f:
+            f.write(data)
+        converted.append(converted_file_info(output_filename, saved_file[1], data, info))
+    return converted
+
+class ZipStreamSink:
+    """Write-only, non-seekable file for zipfile - collects bytes until the response generator takes them"""
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(entries, compression):
+    """Yield a ZIP built from (name, bytes or Exception) entries, each sent as soon as it is written"""
+    sink = ZipStreamSink()
+    failed = []
+    with zipfile.ZipFile(sink, 'w', compression=compression) as zipf:
+        for name, data in entries:
+            if isinstance(data, Exception):
+                print(f"Conversion failed for {name}: {str(data)}")
+                failed.append(f"{name}: {str(data)}")
+                continue
+            zipf.writestr(name, data)
+            yield sink.take()
+        
+        # Headers are already sent - failures go into the archive instead
+        if failed:
+            zipf.writestr('errors.txt', '\n'.join(failed) + '\n')
+    yield sink.take()
+
+def stream_bulk_zip(saved_files, output_format, supported_formats, quality, max_size=0, target_kb=0, pdf_options=None):
+    """Yield a ZIP of the converted uploads, each entry sent as soon as it (and those before it) are converted"""
+    def entries():
+        results = iter_bounded(
+            lambda saved_file: convert_saved_entries(saved_file, output_format, supported_formats, quality,
+                                                     max_size, target_kb, pdf_options),
+            saved_files, app.config['CONVERT_PER_REQUEST']
+        )
+        for (file_id, original_filename, temp_path), result in zip(saved_files, results):
+            if isinstance(result, Exception):
+                yield original_filename, result
+            else:
+                for name, data, info in result:
+                    yield name, data
+    
+    return stream_zip(entries(), zip_compression(output_format))
+
+def bulk_convert_job(saved_files, output_format, supported_formats, quality, max_size=0, target_kb=0, pdf_options=None):
+    """Convert saved uploads in parallel and zip them - job body for /bulk-convert"""
+    try:
+        results = map_bounded(
+            lambda saved_file: convert_saved_file(saved_file, output_format, supported_formats, quality, max_size,
+                                                  target_kb, pdf_options),
+            saved_files, app.config['CONVERT_PER_REQUEST']
+        )
+        
+        # Keep upload order; a bad file is reported instead of failing the batch
+        converted_files = []
+        failed_files = []
+        for (file_id, original_filename, temp_path), result in zip(saved_files, results):
+            if isinstance(result, Exception):
+                print(f"Bulk conversion failed for {original_filename}: {str(result)}")
+                failed_files.append({'original_name': original_filename, 'error': str(result)})
+            else:
+                # PDFs give one file per page
+                converted_files.extend(result)
+                converted_files_info.extend(converted_file['filename'] for converted_file in result)
+        
+        if not converted_files:
+            return {'success': False, 'error': 'No files could be converted', 'failed_files': failed_files}
+        
+        total_size = sum(converted_file['size'] for converted_file in converted_files)
         
         # Create ZIP if multiple files
         if len(converted_files) > 1:
             zip_filename = f"bulk_converted_{secrets.token_hex(8)}.zip"
             zip_path = os.path.join(app.config['CONVERTED_FOLDER'], zip_filename)
             
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
+            with zipfile.ZipFile(zip_path, 'w', compression=zip_compression(output_format)) as zipf:
                 for converted_file in converted_files:
                     file_path = os.path.join(app.config['CONVERTED_FOLDER'], converted_file['filename'])
                     zipf.write(file_path, converted_file['filename'])
             
             converted_files_info.append(zip_filename)
             
-            return jsonify({
+            return {
                 'success': True,
                 'message': f'{len(converted_files)} files converted to {output_format.upper()} and zipped!',
                 'zip_file': zip_filename,
                 'converted_count': len(converted_files),
                 'total_size_kb': round(total_size / 1024, 2),
                 'total_size_mb': round(total_size / (1024 * 1024), 2),
-                'format': output_format
-            })
+                'format': output_format,
+                'files': converted_files,
+                'failed_files': failed_files
+            }
         else:
-            return jsonify({
+            return {
                 'success': True,
                 'message': f'Image converted to {output_format.upper()} successfully!',
                 'converted_file': converted_files[0]['filename'],
                 'file_size_kb': converted_files[0]['size_kb'],
                 'file_size_mb': converted_files[0]['size_mb'],
-                'format': output_format
-            })
+                'format': output_format,
+                'failed_files': failed_files
+            }
             
     except Exception as e:
         print(f"Bulk conversion error: {str(e)}")
-        return jsonify({'success': False, 'error': f'Bulk conversion failed: {str(e)}'})
+        return {'success': False, 'error': f'Bulk conversion failed: {str(e)}'}
 
 # ==================== FILE DOWNLOAD & PREVIEW ====================
 
@@ -2738,6 +4899,8 @@ def clear_files():
         converted_files_info.clear()
         passport_files_info.clear()
         resume_files_info.clear()
+        for cache in result_caches.values():
+            cache.clear()
         
         return jsonify({
             'success': True,
@@ -2748,6 +4911,23 @@ def clear_files():
     except Exception as e:
         return jsonify({'success': False, 'error': f'Clear failed: {str(e)}'})
 
+@app.route('/metrics')
+def metrics():
+    """Cache and worker statistics for tuning"""
+    return jsonify({
+        'timestamp': datetime.now().isoformat(),
+        'caches': {name: cache.stats() for name, cache in result_caches.items()},
+        'jobs': job_manager.stats(),
+        'rembg_sessions': sorted(rembg_sessions),
+        'rembg_session_errors': dict(rembg_session_errors),
+        'segmentations_inflight': segmentations_inflight.value,
+        'segmentation_queue_depth': segmentation_queue_depth(),
+        'segmentation_p90_ms': segmentation_latency.percentile(90),
+        'degraded': dict(degraded_counts),
+        'inference_batches': inference_broker.stats(),
+        'inference_workers': inference_client.stats() if inference_client else 'in-process'
+    })
+
 @app.route('/health')
 def health_check():
     return jsonify({
@@ -0,0 +1,128 @@
+"""Benchmark: hair/edge matting on top of the rembg mask.
+
+Builds a synthetic portrait (hair strands over a gradient backdrop) with a
+known ground-truth alpha and a coarse 320px rembg-like mask, then compares
+the coarse mask, refine_alpha_edges and - when installed - pymatting's
+closed-form matting. Reports best wall time and SAD against ground truth
+(sum of absolute alpha differences / 1000, lower is better).
+
+Closed-form matting is run at --cf-scale of the photo size because it needs
+seconds and gigabytes at full resolution.
+
+Usage:
+    python benchmarks/bench_alpha_matting.py [--width 1500] [--height 2000] [--runs 5] [--cf-scale 0.5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import refine_alpha_edges
+
+
+def make_scene(width, height, seed=0):
+    """Photo, ground-truth alpha and a coarse mask as produced by 320px segmentation"""
+    rng = np.random.default_rng(seed)
+    ss = 2
+    shape = np.zeros((height * ss, width * ss), np.uint8)
+    cx, cy = width * ss // 2, height * ss // 2
+    cv2.ellipse(shape, (cx, cy), (width * ss // 3, height * ss // 3), 0, 0, 360, 255, -1)
+    for _ in range(700):
+        ang = rng.uniform(np.pi * 1.05, np.pi * 1.95)
+        r0 = rng.uniform(0.8, 0.98)
+        x0 = cx + np.cos(ang) * width * ss / 3 * r0
+        y0 = cy + np.sin(ang) * height * ss / 3 * r0
+        length = rng.uniform(30, 120) * ss
+        x1 = x0 + np.cos(ang + rng.normal(0, .3)) * length
+        y1 = y0 + np.sin(ang + rng.normal(0, .3)) * length
+        cv2.line(shape, (int(x0), int(y0)), (int(x1), int(y1)), 255, 1, cv2.LINE_AA)
+    alpha = cv2.resize(shape, (width, height), interpolation=cv2.INTER_AREA).astype(np.float32) / 255
+
+    fg = np.empty((height, width, 3), np.float32)
+    fg[:] = (0.25, 0.18, 0.12)
+    fg += rng.normal(0, 0.03, fg.shape).astype(np.float32)
+    gx = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    bg = (0.55 + 0.35 * gx) * np.array([0.7, 0.85, 1.0], np.float32)
+    bg = bg + rng.normal(0, 0.02, (height, width, 3)).astype(np.float32)
+    photo = np.clip(alpha[..., None] * fg + (1 - alpha[..., None]) * bg, 0, 1)
+
+    small = cv2.resize(alpha, (240, 320), interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur((small > 0.5).astype(np.float32), (3, 3), 0)
+    coarse = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    image = Image.fromarray((photo * 255).astype(np.uint8))
+    mask = Image.fromarray((coarse * 255).astype(np.uint8), mode='L')
+    return image, mask, alpha
+
+
+def sad(mask, alpha):
+    return np.abs(np.asarray(mask, dtype=np.float32) / 255 - alpha).sum() / 1000
+
+
+def timed(fn, runs):
+    """Best wall time in ms and the last result"""
+    best, result = None, None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def closed_form(image, mask):
+    """pymatting closed-form matting with the same trimap rule as refine_alpha_edges"""
+    from pymatting import estimate_alpha_cf
+
+    photo = np.asarray(image, dtype=np.float64) / 255
+    coarse = np.asarray(mask, dtype=np.float32) / 255
+    band = max(2, int(round(mask.height * 0.01)))
+    kernel = np.ones((2 * band + 1, 2 * band + 1), np.uint8)
+    trimap = np.full(coarse.shape, 0.5)
+    trimap[cv2.erode((coarse > 0.95).astype(np.uint8), kernel).astype(bool)] = 1.0
+    trimap[cv2.erode((coarse < 0.05).astype(np.uint8), kernel).astype(bool)] = 0.0
+    alpha = estimate_alpha_cf(photo, trimap)
+    return Image.fromarray((np.clip(alpha, 0, 1) * 255 + 0.5).astype(np.uint8), mode='L')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1500)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cf-scale', type=float, default=0.5, help='photo scale for closed-form matting (0 skips it)')
+    args = parser.parse_args()
+
+    image, mask, alpha = make_scene(args.width, args.height)
+    print(f"photo={args.width}x{args.height} runs={args.runs} (best of)")
+    print(f"{'method':<40}{'ms':>10}{'SAD':>10}")
+
+    ms, refined = timed(lambda: refine_alpha_edges(image, mask), args.runs)
+    print(f"{'coarse mask (rembg upsampled)':<40}{0:>10.0f}{sad(mask, alpha):>10.2f}")
+    print(f"{'refine_alpha_edges':<40}{ms:>10.0f}{sad(refined, alpha):>10.2f}")
+
+    if args.cf_scale <= 0:
+        return
+    try:
+        import pymatting  # noqa: F401
+    except ImportError:
+        print("pymatting not installed - skipping closed-form matting")
+        return
+
+    w, h = int(args.width * args.cf_scale), int(args.height * args.cf_scale)
+    small_image, small_mask, small_alpha = make_scene(w, h)
+    _, small_refined = timed(lambda: refine_alpha_edges(small_image, small_mask), 1)
+    ms, matted = timed(lambda: closed_form(small_image, small_mask), 1)
+    print(f"\nat {w}x{h}:")
+    print(f"{'coarse mask':<40}{0:>10.0f}{sad(small_mask, small_alpha):>10.2f}")
+    print(f"{'refine_alpha_edges':<40}{'':>10}{sad(small_refined, small_alpha):>10.2f}")
+    print(f"{'pymatting estimate_alpha_cf':<40}{ms:>10.0f}{sad(matted, small_alpha):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Micro-benchmark: pixmap -> PIL handoff in the card cropper.
+
+Compares the old PPM round trip (pix.tobytes("ppm") + Image.open) with the
+zero-copy Image.frombuffer view used by render_card_region, for both the
+full 300 DPI page and the front/back clip regions.
+
+Memory is the peak RSS growth of one request, measured in a fresh child
+process per case (Unix only; pixmaps and Pillow buffers live outside the
+Python heap, so tracemalloc would not see them).
+
+Usage:
+    python benchmarks/bench_card_crop.py [card.pdf] [--card-type aadhaar] [--runs 20]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import time
+
+import fitz
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import get_card_crop_rects, pixmap_to_image
+
+
+def make_sample_pdf():
+    """A4 page with vector text and a photo-like image, similar to an e-card"""
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.draw_rect(fitz.Rect(30, 600, 565, 800), color=(0, 0, 0), fill=(0.95, 0.95, 1))
+    page.insert_text((50, 640), "SAMPLE CARD FRONT", fontsize=14)
+    page.insert_text((320, 640), "SAMPLE CARD BACK", fontsize=14)
+    gradient = Image.linear_gradient('L').resize((400, 300)).convert('RGB')
+    buf = io.BytesIO()
+    gradient.save(buf, format='PNG')
+    page.insert_image(fitz.Rect(50, 660, 150, 760), stream=buf.getvalue())
+    return doc
+
+
+def ppm_handoff(pix, boxes=None):
+    """Old path: serialize to PPM once per pixmap, parse it again and crop every box"""
+    img = Image.open(io.BytesIO(pix.tobytes("ppm")))
+    img.load()
+    return [img.crop(box) for box in boxes] if boxes else [img]
+
+
+def zero_copy_handoff(pix, boxes=None):
+    """New path: wrap pix.samples directly"""
+    view = pixmap_to_image(pix)
+    return [view.crop(box) for box in boxes] if boxes else [view.copy()]
+
+
+def timed(fn, runs):
+    """Best wall time in ms"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read"""
+    # Linux: VmHWM restarts at exec, while ru_maxrss keeps the parent's peak from fork
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measured_peak_mb(case):
+    """Run one request of the case in a fresh process and return its peak RSS growth in MB"""
+    cmd = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--measure-case', str(case)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.split()
+    return float(out[-1]) if out and out[-1] != 'None' else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help='card PDF (a synthetic A4 page is used if omitted)')
+    parser.add_argument('--card-type', default='aadhaar')
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--measure-case', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    doc = fitz.open(args.pdf) if args.pdf else make_sample_pdf()
+    if doc.needs_pass and not doc.authenticate(args.password or ''):
+        sys.exit("PDF is password protected - pass --password")
+    page = doc.load_page(0)
+    matrix = fitz.Matrix(args.dpi / 72, args.dpi / 72)
+    rects = get_card_crop_rects(args.card_type, page.rect)
+
+    def full_page(handoff):
+        pix = page.get_pixmap(matrix=matrix)
+        zoom = args.dpi / 72
+        return handoff(pix, [tuple(int(v * zoom) for v in rect) for rect in rects])
+
+    def clip_regions(handoff):
+        cards = []
+        for rect in rects:
+            pix = page.get_pixmap(matrix=matrix, clip=rect & page.rect, alpha=False)
+            cards.extend(handoff(pix))
+        return cards
+
+    cases = [
+        ("full page + PPM (original)", lambda: full_page(ppm_handoff)),
+        ("full page + zero-copy", lambda: full_page(zero_copy_handoff)),
+        ("clip regions + PPM", lambda: clip_regions(ppm_handoff)),
+        ("clip regions + zero-copy (current)", lambda: clip_regions(zero_copy_handoff)),
+    ]
+
+    if args.measure_case is not None:
+        # Warm up fonts and the renderer on a tiny clip so only the request itself raises the peak
+        page.get_pixmap(clip=fitz.Rect(0, 0, 10, 10))
+        before = peak_rss_mb()
+        cards = cases[args.measure_case][1]()
+        after = peak_rss_mb()
+        print(None if before is None else after - before)
+        del cards
+        return
+
+    print(f"card_type={args.card_type} dpi={args.dpi} runs={args.runs} (best of)")
+    print(f"{'path':<38}{'ms/request':>12}{'peak RSS MB':>14}")
+    results = []
+    for i, (name, fn) in enumerate(cases):
+        ms = timed(fn, args.runs)
+        mb = measured_peak_mb(i)
+        results.append((ms, mb))
+        print(f"{name:<38}{ms:>12.1f}{'n/a' if mb is None else f'{mb:.1f}':>14}")
+
+    base_ms, base_mb = results[0]
+    cur_ms, cur_mb = results[-1]
+    saved_mb = 'n/a' if base_mb is None else f"{base_mb - cur_mb:.1f} MB"
+    print(f"\nSaved per request: {base_ms - cur_ms:.1f} ms, {saved_mb} peak RSS")
+
+
+if __name__ == '__main__':
+    main()
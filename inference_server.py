@@ -0,0 +1,127 @@
+# inference_server.py
+"""Out-of-process background-removal worker.
+
+Loads the rembg models once and serves masks to the Flask workers over a
+local Unix socket, so model memory is paid once per node instead of once
+per gunicorn worker. Requests from all web workers share one micro-batching
+broker.
+
+Usage:
+    python inference_server.py --socket /tmp/ecard-inference.sock [--processes 2]
+
+With --processes N the sockets are <socket>.0 ... <socket>.N-1. Point the
+web workers at them with INFERENCE_SOCKETS (comma-separated) and the same
+INFERENCE_AUTHKEY. The authkey is required: connections are pickle-based,
+so it is the only thing stopping other local users from running code here.
+Sockets are created owner-only (0600).
+"""
+import argparse
+import multiprocessing
+import os
+import stat
+import sys
+import threading
+from multiprocessing.connection import Listener
+
+from PIL import Image
+
+import app as web
+
+
+def handle_connection(conn):
+    """Serve predict requests from one web worker until it disconnects"""
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if request[0] == 'depth':
+                    # Load signal for the web workers' fast-model / degraded-mode switches
+                    response = ('ok', web.segmentations_inflight.value)
+                else:
+                    action, model_name, mode, size, pixels = request
+                    if action != 'predict':
+                        raise ValueError(f'Unknown action: {action}')
+                    image = Image.frombytes(mode, tuple(size), pixels)
+                    with web.segmentations_inflight:
+                        mask = web.local_predict_alpha_mask(image, model_name)
+                    response = ('ok', mask.tobytes())
+            except Exception as e:
+                print(f"Inference error: {e}")
+                response = ('error', str(e))
+
+            try:
+                conn.send(response)
+            except (EOFError, OSError):
+                return
+
+
+def serve(address, authkey, preload=()):
+    """Accept web worker connections on a Unix socket, one thread per connection"""
+    if not authkey:
+        raise ValueError('INFERENCE_AUTHKEY is required')
+
+    # Only clear a stale socket from an earlier run - never some other file passed by mistake
+    if os.path.lexists(address):
+        if not stat.S_ISSOCK(os.lstat(address).st_mode):
+            raise ValueError(f'{address} exists and is not a socket')
+        os.remove(address)
+
+    for model_name in preload:
+        web.get_rembg_session(model_name)
+
+    # Owner-only from the moment it is bound
+    old_umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family='AF_UNIX', authkey=authkey)
+    finally:
+        os.umask(old_umask)
+    os.chmod(address, 0o600)
+
+    with listener:
+        print(f"Inference worker {os.getpid()} listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Failed handshake (wrong authkey etc.) - keep serving everyone else
+                print(f"Rejected connection: {e}")
+                continue
+            threading.Thread(target=handle_connection, args=(conn,), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default='/tmp/ecard-inference.sock', help='Unix socket path')
+    parser.add_argument('--processes', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--preload', default=','.join(web.app.config['REMBG_MODEL_TIERS'].values()),
+                        help='comma-separated models to load at startup')
+    args = parser.parse_args()
+
+    authkey = web.app.config['INFERENCE_AUTHKEY']
+    if not authkey:
+        sys.exit("INFERENCE_AUTHKEY is not set - export a random secret (e.g. openssl rand -hex 32) "
+                 "and use the same value for the web workers")
+    preload = [m for m in args.preload.split(',') if m]
+
+    if args.processes <= 1:
+        serve(args.socket, authkey, preload)
+        return
+
+    ctx = multiprocessing.get_context('spawn')
+    workers = [
+        ctx.Process(target=serve, args=(f"{args.socket}.{i}", authkey, preload), daemon=True)
+        for i in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+    print("INFERENCE_SOCKETS=" + ','.join(f"{args.socket}.{i}" for i in range(args.processes)))
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == '__main__':
+    main()